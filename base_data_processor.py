@@ -1,11 +1,15 @@
 # base_data_processor.py
 
-from data_processing import load_df, rearrange_columns, rename_columns, add_total_column, replace_values, conditional_replace
+from calculations import compute_totals
+from data_processing import load_df, rearrange_columns, rename_columns, replace_codes
 import pandas as pd
 from typing import Union
 import streamlit as st
-import numpy as np
 from pathlib import Path
+from utils.config_loader import get_config_loader
+from utils.csv_export import to_csv_bytes
+from utils.csv_reader import CsvSchema, detect_encoding, format_detection
+from utils.rule_engine import compile_rules
 
 
 class BaseDataProcessor:
@@ -15,15 +19,28 @@ class BaseDataProcessor:
     columns_rename = {}  # 列名の変更マッピング
     total_columns = {}  # 合計列の追加ルール
     replace_rules = {}  # 値の置き換えルール
-    conditional_rules = []  # 条件付き置き換えルール
+    conditional_rules = []  # 条件付き置き換えルール（rule_engine形式、空の場合は設定セクションのconditional_rules）
+    schema_section = None  # 列の型定義（input.numeric_columns等）を読み込む設定セクション
 
-    def __init__(self, file):
+    def __init__(self, file, encoding: str = None):
         """
         基底クラスの初期化
         Args:
             file: アップロードされたファイルまたはファイルパス
+            encoding: ファイルの文字コード（省略時は自動判定）
         """
         try:
+            # 計算サマリーの初期化
+            self.calculation_summary = {
+                'calculated_items': [],
+                'missing_columns': [],
+                'excluded_items': [],
+                'calculation_warnings': [],
+                'file_info': []
+            }
+            self.encoding = encoding
+            self.encoding_detect_time = None
+
             if file is None:
                 self.df = pd.DataFrame()
             else:
@@ -32,56 +49,59 @@ class BaseDataProcessor:
                     file_path = Path(file)
                     if not file_path.exists():
                         raise FileNotFoundError(f"ファイルが見つかりません: {file_path}")
-                    file = open(file_path, 'rb')
-
-                # ファイルの読み込みを試行（複数のエンコーディングを試す）
-                encodings = ['utf-8', 'utf-8-sig', 'cp932', 'shift-jis']
-                last_error = None
-
-                for encoding in encodings:
-                    try:
-                        # ファイルポインタを先頭に戻す
-                        file.seek(0)
-                        self.df = pd.read_csv(file, encoding=encoding, dtype=str)
-                        st.success(f"ファイルを {encoding} で正常に読み込みました")
-                        break
-                    except UnicodeDecodeError as e:
-                        last_error = e
-                        continue
-                    except Exception as e:
-                        st.error(f"ファイル読み込みエラー ({encoding}): {str(e)}")
-                        last_error = e
-                        continue
+                    with open(file_path, 'rb') as f:
+                        self.df = self._read_file(f, encoding)
                 else:
-                    error_msg = f"ファイルの読み込みに失敗しました: {str(last_error)}"
-                    st.error(error_msg)
-                    raise ValueError(error_msg)
+                    self.df = self._read_file(file, encoding)
 
-                # ファイルパスの場合はファイルを閉じる
-                if isinstance(file, (str, Path)):
-                    file.close()
-                
-                # 空白文字の処理
-                self.df = self.df.replace('', np.nan)
-                self.df = self.df.fillna('')
+                st.success(f"ファイルを {self.encoding} で正常に読み込みました")
+                self.add_calculation_info('file_info', format_detection(self.encoding, self.encoding_detect_time))
 
                 # デバッグ情報
                 st.info(f"読み込んだカラム: {', '.join(self.df.columns)}")
                 st.info(f"データ件数: {len(self.df)}件")
-                
-            # 計算サマリーの初期化
-            self.calculation_summary = {
-                'calculated_items': [],
-                'missing_columns': [],
-                'excluded_items': [],
-                'calculation_warnings': []
-            }
 
         except Exception as e:
             st.error(f"初期化エラー: {str(e)}")
             self.df = pd.DataFrame()
             raise
 
+    def _read_file(self, file, encoding: str = None) -> pd.DataFrame:
+        """
+        文字コードを判定してCSVを1回だけ読み込む
+        Args:
+            file: バイナリモードのファイルオブジェクト
+            encoding: ファイルの文字コード（省略時は先頭サンプルから判定）
+        Returns:
+            pd.DataFrame: 読み込んだデータフレーム
+        """
+        if encoding is None:
+            encoding, self.encoding_detect_time = detect_encoding(file)
+        self.encoding = encoding
+        schema = self.get_schema()
+
+        try:
+            return schema.read_csv(file, encoding)
+        except UnicodeDecodeError:
+            if self.encoding_detect_time is None:
+                raise
+            # サンプル以降に判定と異なる文字が含まれる場合はファイル全体で判定し直す
+            encoding, elapsed = detect_encoding(file, validate=True)
+            self.encoding = encoding
+            self.encoding_detect_time += elapsed
+            return schema.read_csv(file, encoding)
+
+    def get_schema(self) -> CsvSchema:
+        """
+        読み込み時の列の型定義を取得
+        （数値列・カテゴリ列以外は文字列、欠損値は空文字とする）
+        Returns:
+            CsvSchema: 列の型定義
+        """
+        if self.schema_section is None:
+            return CsvSchema(default_dtype=str, text_na_value='')
+        return CsvSchema.from_config(get_config_loader(), self.schema_section, default_dtype=str, text_na_value='')
+
     def validate_dataframe(self) -> bool:
         """
         データフレームの基本的な検証
@@ -91,12 +111,13 @@ class BaseDataProcessor:
         return self.df is not None and not self.df.empty
 
     def clear_calculation_summary(self) -> None:
-        """計算サマリーをクリア"""
+        """計算サマリーをクリア（読み込み情報は保持）"""
         self.calculation_summary = {
             'calculated_items': [],
             'missing_columns': [],
             'excluded_items': [],
-            'calculation_warnings': []
+            'calculation_warnings': [],
+            'file_info': self.calculation_summary.get('file_info', [])
         }
 
     def add_calculation_info(self, category: str, message: str) -> None:
@@ -115,6 +136,12 @@ class BaseDataProcessor:
             return
 
         st.write("### 処理サマリー")
+
+        # 読み込み情報
+        if self.calculation_summary.get('file_info'):
+            st.write("#### 読み込み情報")
+            for item in self.calculation_summary['file_info']:
+                st.write(f"- {item}")
         
         # 計算項目
         if self.calculation_summary['calculated_items']:
@@ -151,7 +178,7 @@ class BaseDataProcessor:
         try:
             if not self.validate_dataframe():
                 return b""
-            return self.df.to_csv(index=index).encode('cp932')
+            return to_csv_bytes(self.df, index=index, encoding='cp932')
         except Exception as e:
             st.error(f"CSV変換エラー: {str(e)}")
             return b""
@@ -174,8 +201,15 @@ class BaseDataProcessor:
         return self.df
 
     def add_total_columns(self):
-        for new_column_name, column_list in self.total_columns.items():
-            self.df = add_total_column(self.df, column_list, new_column_name)
+        # 全ての合計列を1回の行列積で計算（先に定義した合計列も参照可能）
+        if not self.total_columns:
+            return
+        totals, missing = compute_totals(self.df, self.total_columns)
+        # 一部の対象列だけが存在しない場合も、合計から除いた列を記録
+        for new_column_name, missing_columns in missing.items():
+            self.add_calculation_info('missing_columns', f"{new_column_name}: {', '.join(missing_columns)}")
+        for new_column_name, values in totals.items():
+            self.df[new_column_name] = values
 
     def rename_df_columns(self):
         if self.columns_rename:
@@ -187,9 +221,25 @@ class BaseDataProcessor:
 
     def apply_replace_values(self):
         for column, replacements in self.replace_rules.items():
-            self.df = replace_values(self.df, column, replacements)
+            # 参照表で一括変換し、変換対象外のコードは処理の警告に記録
+            self.df[column], unmapped = replace_codes(self.df[column], replacements)
+            if unmapped:
+                self.add_calculation_info('calculation_warnings',
+                                          f"{column}の変換対象外のコード: {', '.join(map(str, unmapped))}")
+
+    def get_conditional_rules(self):
+        """
+        条件付き置き換えルールを取得
+        Returns:
+            クラスで定義したルール、なければ設定ファイル（schema_sectionのconditional_rules）のルール
+        """
+        if self.conditional_rules or self.schema_section is None:
+            return self.conditional_rules
+        return get_config_loader().get_settings(self.schema_section, 'conditional_rules') or []
 
     def apply_conditional_replace(self):
-        for condition, column, new_value in self.conditional_rules:
-            self.df = conditional_replace(self.df, condition(self.df), column, new_value)
+        # 同じ条件は1回だけ判定し、カラムごとの書き込みをまとめて反映（定義順に順次適用した場合と同じ結果）
+        rules = self.get_conditional_rules()
+        if rules:
+            compile_rules(rules).apply(self.df)
 
@@ -0,0 +1,168 @@
+"""
+賞与データの条件付き置き換え（BaseDataProcessor.apply_conditional_replace）と
+賞与データ処理全体（BonusDataProcessor.process_data）のマイクロベンチマーク
+
+    python benchmarks/bench_bonus_rules.py [行数]
+"""
+import io
+import logging
+import os
+import sys
+import timeit
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from bonus_data_processor import BonusDataProcessor  # noqa: E402
+from utils.config_loader import DEFAULT_CONFIG_PATH, get_config_loader  # noqa: E402
+from utils.rule_engine import compile_rules  # noqa: E402
+
+# 変更前のBonusDataProcessor.conditional_rules（1ルールずつSeries.maskで適用）
+LAMBDA_RULES = [
+    (lambda df: df['所属名'] == '代表取締役社長', '雇用形態名', lambda df: df['所属名']),
+    (lambda df: df['所属名'] == '取締役', '雇用形態名', lambda df: df['所属名']),
+    (lambda df: df['所属名'] == '監査役', '雇用形態名', lambda df: df['所属名']),
+    (lambda df: df['所属名'] == '部長', '所属', lambda df: df['部署コード1']),
+    (lambda df: df['所属名'] == '部長', '所属名', lambda df: df['部署コード1名']),
+    (lambda df: df['所属名'] == 'ＩＴマイスター', '所属', lambda df: df['部署コード1']),
+    (lambda df: df['所属名'] == 'ＩＴマイスター', '所属名', lambda df: df['部署コード1名']),
+    (lambda df: df['所属'] == 90, '所属名', lambda df: df['部署コード1名']),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 1, 'ｾｸﾞﾒﾝﾄ', 9001),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 2, 'ｾｸﾞﾒﾝﾄ', 2200),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 3, 'ｾｸﾞﾒﾝﾄ', 3201),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 4, 'ｾｸﾞﾒﾝﾄ', 3202),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 5, 'ｾｸﾞﾒﾝﾄ', 1900),
+    (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 31) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 1900),
+    (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 21) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 1900),
+    (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 71) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 2300),
+    (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 18) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 3101),
+    (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 37) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 1409),
+    (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 63) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 2100),
+    (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 64) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 2100),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 9001, 'ｾｸﾞﾒﾝﾄ名', '共通経費'),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 1900, 'ｾｸﾞﾒﾝﾄ名', '3ｻｰﾋﾞｽ共通'),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 2100, 'ｾｸﾞﾒﾝﾄ名', 'ｺﾐｭﾆﾃｨCH'),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 2200, 'ｾｸﾞﾒﾝﾄ名', 'ｺﾐｭﾆﾃｨFM'),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 2300, 'ｾｸﾞﾒﾝﾄ名', 'ﾌﾘｰﾍﾟｰﾊﾟｰ'),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 1409, 'ｾｸﾞﾒﾝﾄ名', 'ｿﾘｭｰｼｮﾝ'),
+    (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 3101, 'ｾｸﾞﾒﾝﾄ名', 'ｲﾍﾞﾝﾄ'),
+]
+
+
+def make_bonus(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    列名変換後の賞与データと同じ形式のデータを作成（名称列はobject型）
+    """
+    rng = np.random.default_rng(seed)
+    names = ['代表取締役社長', '取締役', '監査役', '部長', 'ＩＴマイスター', '総務人事課', '技術課', '制作課']
+    return pd.DataFrame({
+        '雇用形態': rng.integers(0, 4, n_rows),
+        '雇用形態名': rng.choice(['正社員', '契約社員', 'パート'], n_rows),
+        '部署コード1': rng.choice([90, 41, 31, 81, 21, 11, 61, 71, 18, 37, 63, 64], n_rows),
+        '部署コード1名': rng.choice(['共通', '経営企画部', 'コンシューマ事業部', '技術サービス部'], n_rows),
+        '所属': rng.choice([46, 42, 37, 90, 22, 18, 71, 63, 64], n_rows),
+        '所属名': rng.choice(names, n_rows),
+        'ｾｸﾞﾒﾝﾄ': rng.integers(1, 6, n_rows),
+        'ｾｸﾞﾒﾝﾄ名': rng.choice(['一般', 'FM', 'KURUTO'], n_rows),
+    })
+
+
+def make_bonus_csv(n_rows: int, seed: int = 0) -> bytes:
+    """
+    変換前のカラム名の賞与データ（cp932のCSV）を作成
+    """
+    rng = np.random.default_rng(seed)
+    generators = {
+        '氏名': lambda: [f'氏名{i}' for i in range(n_rows)],
+        '原価区分': lambda: rng.integers(0, 3, n_rows),
+        '所属': lambda: rng.integers(0, 4, n_rows),
+        '所属名': lambda: rng.choice(['正社員', '契約社員', 'パート'], n_rows),
+        '所属コード1': lambda: rng.choice([0, 10, 20, 40, 50, 60, 70], n_rows),
+        '所属コード1名': lambda: rng.choice(['共通', '経営企画部', 'コンシューマ事業部', '技術サービス部'], n_rows),
+        '事業所': lambda: rng.choice([13, 14, 23, 24, 25, 26, 27, 15, 53, 54, 63, 64, 65, 73, 74], n_rows),
+        '事業所名': lambda: rng.choice(['代表取締役社長', '取締役', '監査役', '部長', 'ＩＴマイスター', '総務人事課', '技術課'],
+                                   n_rows),
+        '部門': lambda: rng.integers(1, 6, n_rows),
+        '部門名': lambda: rng.choice(['一般', 'FM', 'KURUTO'], n_rows),
+    }
+    df = pd.DataFrame({
+        col: generators[col]() if col in generators else rng.integers(0, 100000, n_rows)
+        for col in BonusDataProcessor.columns_order
+    })
+    return df.to_csv(index=False).encode('cp932')
+
+
+class SequentialBonusProcessor(BonusDataProcessor):
+    """変更前の条件付き置き換え（1ルールずつSeries.maskで適用）を行う賞与データ処理"""
+
+    def apply_conditional_replace(self):
+        # 変更前の処理はカテゴリにない値の書き込みでTypeErrorになるため、書き込み先の名称列は文字列に戻して適用
+        targets = {column for _, column, _ in LAMBDA_RULES}
+        categorical = [col for col in targets if isinstance(self.df[col].dtype, pd.CategoricalDtype)]
+        self.df = sequential_version(self.df.astype({col: object for col in categorical}))
+
+
+def sequential_version(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    for condition, column, new_value in LAMBDA_RULES:
+        value = new_value(df) if callable(new_value) else new_value
+        df[column] = df[column].mask(condition(df), value)
+    return df
+
+
+def compiled_version(df: pd.DataFrame, rules) -> pd.DataFrame:
+    df = df.copy()
+    compile_rules(rules).apply(df)
+    return df
+
+
+def main(n_rows: int = 200_000, repeat: int = 5) -> None:
+    rules = get_config_loader(str(ROOT / DEFAULT_CONFIG_PATH)).get_settings('bonus', 'conditional_rules')
+    df = make_bonus(n_rows)
+    expected = sequential_version(df)
+    pd.testing.assert_frame_equal(expected, compiled_version(df, rules))
+
+    # 名称列がカテゴリ型の場合（変更前はカテゴリにない値の書き込みでTypeError）も値は同じ
+    categorical = df.astype({col: 'category' for col in ['雇用形態名', '部署コード1名', '所属名', 'ｾｸﾞﾒﾝﾄ名']})
+    pd.testing.assert_frame_equal(expected, compiled_version(categorical, rules).astype(expected.dtypes.to_dict()))
+
+    sequential_time = min(timeit.repeat(lambda: sequential_version(df), number=1, repeat=repeat))
+    compiled_time = min(timeit.repeat(lambda: compiled_version(df, rules), number=1, repeat=repeat))
+    print(f'行数: {n_rows:,} / ルール数: {len(LAMBDA_RULES)}')
+    print('条件付き置き換え')
+    print(f'  sequential : {sequential_time * 1000:8.1f} ms')
+    print(f'  compiled   : {compiled_time * 1000:8.1f} ms  (x{sequential_time / compiled_time:.1f})')
+
+    # 賞与データ処理全体（CSV読み込み後の列変換・コード変換・条件付き置き換え・集計）
+    csv = make_bonus_csv(n_rows)
+    processors = {cls: cls(io.BytesIO(csv)) for cls in (SequentialBonusProcessor, BonusDataProcessor)}
+    raw = {cls: processor.df for cls, processor in processors.items()}
+
+    def process(cls):
+        processor = processors[cls]
+        processor.df = raw[cls].copy()
+        return processor.process_data()
+
+    expected = process(SequentialBonusProcessor)
+    result = process(BonusDataProcessor)
+    pd.testing.assert_frame_equal(expected, result)
+    pd.testing.assert_frame_equal(processors[SequentialBonusProcessor].summary, processors[BonusDataProcessor].summary)
+
+    sequential_time = min(timeit.repeat(lambda: process(SequentialBonusProcessor), number=1, repeat=repeat))
+    compiled_time = min(timeit.repeat(lambda: process(BonusDataProcessor), number=1, repeat=repeat))
+    print('賞与データ処理全体（process_data）')
+    print(f'  sequential : {sequential_time * 1000:8.1f} ms')
+    print(f'  compiled   : {compiled_time * 1000:8.1f} ms  (x{sequential_time / compiled_time:.1f})')
+
+
+if __name__ == '__main__':
+    warnings.simplefilter('ignore')
+    logging.disable(logging.WARNING)
+    # 設定ファイルは作業ディレクトリからの相対パスで読み込まれる
+    os.chdir(ROOT)
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
@@ -0,0 +1,60 @@
+"""
+コード列の文字列変換（journal_transform.concat_df / load_long_data）のマイクロベンチマーク
+
+    python benchmarks/bench_code_normalization.py [行数]
+"""
+import sys
+import timeit
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from data_processing import to_code_string, to_integer  # noqa: E402
+
+
+def make_codes(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """
+    振替伝票と同じ形式（fillna(0)後のfloat64）のコード列・金額列を作成
+    """
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'ac_cd': rng.integers(5000, 8300, n_rows).astype(float),
+        'sub_cd': rng.integers(0, 100, n_rows).astype(float),
+        'section_cd': rng.integers(0, 1000, n_rows).astype(float),
+        'segment_cd': rng.integers(0, 20, n_rows).astype(float),
+        'price': rng.normal(0, 1e5, n_rows).round(),
+    })
+
+
+def apply_version(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    for col in ['ac_cd', 'sub_cd', 'section_cd', 'segment_cd']:
+        df[col] = df[col].apply(lambda x: str(int(x)))
+    df['price'] = df['price'].apply(lambda x: int(x))
+    return df
+
+
+def vectorized_version(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    for col in ['ac_cd', 'sub_cd', 'section_cd', 'segment_cd']:
+        df[col] = to_code_string(df[col])
+    df['price'] = to_integer(df['price'])
+    return df
+
+
+def main(n_rows: int = 200_000, repeat: int = 5) -> None:
+    df = make_codes(n_rows)
+    pd.testing.assert_frame_equal(apply_version(df), vectorized_version(df))
+
+    apply_time = min(timeit.repeat(lambda: apply_version(df), number=1, repeat=repeat))
+    vectorized_time = min(timeit.repeat(lambda: vectorized_version(df), number=1, repeat=repeat))
+    print(f'行数: {n_rows:,}')
+    print(f'apply      : {apply_time * 1000:8.1f} ms')
+    print(f'vectorized : {vectorized_time * 1000:8.1f} ms  (x{apply_time / vectorized_time:.1f})')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200_000)
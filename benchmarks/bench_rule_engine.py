@@ -0,0 +1,134 @@
+"""
+条件付き変換ルール（utils.rule_engine.compile_rules）と変更前の順次適用（df.loc）の比較
+（ランダムなルール・データで値と型が一致することを確認し、処理時間を計測）
+
+    python benchmarks/bench_rule_engine.py [ルールセット数]
+"""
+import sys
+import timeit
+import warnings
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from utils.rule_engine import compile_rules  # noqa: E402
+
+COLUMNS = ['int', 'code', 'float', 'fraction', 'nullable', 'text', 'flag']
+VALUES = [1, 2, 2.0, 2.5, 'x', True, 9001]
+
+
+def sequential_version(df: pd.DataFrame, rules: dict) -> None:
+    """
+    変更前のSalaryDataProcessor._apply_conditional_rules（1ルールずつdf.locで書き込み）
+    """
+    for group, group_rules in rules.items():
+        for rule in group_rules:
+            conditions = rule.get('conditions', {})
+            target = rule.get('target')
+            value = rule.get('value')
+            source = rule.get('source')
+            if not target or not conditions:
+                continue
+            mask = pd.Series([True] * len(df))
+            for col, cond_val in conditions.items():
+                if isinstance(cond_val, str) and cond_val.startswith('>'):
+                    try:
+                        mask &= df[col].astype(float) > float(cond_val[1:].strip())
+                    except Exception:
+                        mask &= False
+                elif isinstance(cond_val, str) and cond_val.startswith('<'):
+                    try:
+                        mask &= df[col].astype(float) < float(cond_val[1:].strip())
+                    except Exception:
+                        mask &= False
+                else:
+                    mask &= df[col] == cond_val
+            if value is not None:
+                df.loc[mask, target] = value
+            elif source is not None and source in df.columns:
+                df.loc[mask, target] = df.loc[mask, source]
+
+
+def make_frame(rng: np.random.Generator, n_rows: int) -> pd.DataFrame:
+    """
+    整数・浮動小数点（整数値/小数値/欠損値あり）・文字列・真偽値の列を持つデータを作成
+    """
+    return pd.DataFrame({
+        'int': rng.integers(0, 4, n_rows),
+        'code': rng.integers(0, 4, n_rows),
+        'float': rng.integers(0, 4, n_rows).astype(float),
+        'fraction': rng.choice([0.5, 1.0, 2.0, 3.5], n_rows),
+        'nullable': np.where(rng.random(n_rows) < 0.2, np.nan, rng.integers(0, 4, n_rows).astype(float)),
+        'text': rng.choice(['a', 'b', 'c'], n_rows).astype(object),
+        'flag': rng.random(n_rows) < 0.5,
+    })
+
+
+def make_rule(rng: np.random.Generator) -> dict:
+    """
+    ランダムな条件（等値・数値比較、1～2条件）と書き込み（固定値・別カラムの値）のルールを作成
+    """
+    conditions = {}
+    for col in rng.choice(COLUMNS, rng.integers(1, 3), replace=False):
+        col = str(col)
+        r = rng.random()
+        if col == 'text':
+            conditions[col] = str(rng.choice(['a', 'b', 'c']))
+        elif col == 'flag':
+            conditions[col] = bool(r < 0.5)
+        elif r < 0.3:
+            conditions[col] = f'> {rng.integers(0, 3)}'
+        elif r < 0.5:
+            conditions[col] = float(rng.integers(0, 4))
+        else:
+            conditions[col] = int(rng.integers(0, 4))
+    rule = {'conditions': conditions, 'target': str(rng.choice(COLUMNS + ['new']))}
+    if rng.random() < 0.5:
+        rule['source'] = str(rng.choice(COLUMNS))
+    else:
+        rule['value'] = VALUES[rng.integers(0, len(VALUES))]
+    return rule
+
+
+def check_random_rules(n_sets: int, seed: int = 0) -> None:
+    """
+    ランダムなルールセットで、値・型・例外が変更前の順次適用と一致することを確認
+    """
+    rng = np.random.default_rng(seed)
+    for _ in range(n_sets):
+        df = make_frame(rng, int(rng.integers(1, 30)))
+        rules = {'random': [make_rule(rng) for _ in range(int(rng.integers(1, 6)))]}
+        expected, result = df.copy(), df.copy()
+        errors = []
+        for apply, frame in ((lambda d: sequential_version(d, rules), expected),
+                             (lambda d: compile_rules(rules).apply(d), result)):
+            try:
+                apply(frame)
+                errors.append(None)
+            except KeyError as e:
+                errors.append(e.args)
+        assert errors[0] == errors[1], (rules, errors)
+        pd.testing.assert_frame_equal(expected, result, check_exact=True, obj=str(rules))
+
+
+def main(n_sets: int = 2000, n_rows: int = 200_000, repeat: int = 5) -> None:
+    # 変更前の処理は型の変更ごとにFutureWarningを出す
+    warnings.simplefilter('ignore', FutureWarning)
+    check_random_rules(n_sets)
+    print(f'ランダムなルールセット {n_sets:,} 件: 値・型とも一致')
+
+    rng = np.random.default_rng(1)
+    df = make_frame(rng, n_rows)
+    rules = {'random': [make_rule(rng) for _ in range(30)]}
+    sequential_time = min(timeit.repeat(lambda: sequential_version(df.copy(), rules), number=1, repeat=repeat))
+    compiled_time = min(timeit.repeat(lambda: compile_rules(rules).apply(df.copy()), number=1, repeat=repeat))
+    print(f'行数: {n_rows:,} / ルール数: {len(rules["random"])}')
+    print(f'sequential : {sequential_time * 1000:8.1f} ms')
+    print(f'compiled   : {compiled_time * 1000:8.1f} ms  (x{sequential_time / compiled_time:.1f})')
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,125 @@
+"""
+給与データ処理（SalaryDataProcessor.process_data）の段階ごとの時間・メモリ計測
+（変更前の処理・変更後の処理・変更後の処理＋Copy-on-Writeをそれぞれ別プロセスで計測）
+
+    python benchmarks/bench_salary_memory.py [行数]
+"""
+import io
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from utils.config_loader import DEFAULT_CONFIG_PATH, get_config_loader  # noqa: E402
+
+
+def make_salary_csv(n_rows: int, seed: int = 0) -> bytes:
+    """
+    設定ファイルの必須カラムを持つ給与データ（cp932のCSV）を作成
+    """
+    config = get_config_loader(str(ROOT / DEFAULT_CONFIG_PATH))
+    required = config.get_settings('salary', 'input.required_columns')
+    rng = np.random.default_rng(seed)
+    generators = {
+        '会社NO': lambda: np.ones(n_rows, dtype=np.int64),
+        '対象年月': lambda: np.full(n_rows, 202504),
+        'コード': lambda: np.arange(n_rows) + 1000,
+        '氏名': lambda: [f'氏名{i}' for i in range(n_rows)],
+        '所属': lambda: rng.integers(0, 4, n_rows),
+        '所属名': lambda: rng.choice(['正社員', '契約社員', 'パート', '嘱託'], n_rows),
+        '所属コード1': lambda: rng.choice([0, 10, 20, 40, 50, 60, 70], n_rows),
+        '所属コード1名': lambda: rng.choice(['共通', '経営企画部', 'コンシューマ事業部'], n_rows),
+        '事業所': lambda: rng.choice([10, 11, 12, 13, 14, 23, 24, 51, 53, 61, 63, 71, 99], n_rows),
+        '事業所名': lambda: rng.choice(['代表取締役社長', '取締役', '部長', '総務人事課', '技術課', '編成課'], n_rows),
+        '部門': lambda: rng.integers(1, 10, n_rows),
+        '部門名': lambda: rng.choice(['一般', 'FM', 'KURUTO'], n_rows),
+        '資格': lambda: rng.choice(['A', 'B'], n_rows),
+        '原価区分': lambda: rng.integers(0, 3, n_rows),
+    }
+    df = pd.DataFrame({
+        col: generators[col]() if col in generators
+        else rng.integers(0, 50000, n_rows) * rng.integers(0, 2, n_rows)
+        for col in required
+    })
+    return df.to_csv(index=False).encode('cp932')
+
+
+# 計測する処理（名前 → (変更前の処理を再現するか, Copy-on-Write)）
+MODES = {
+    'before': (True, False),
+    'after': (False, False),
+    'after-cow': (False, True),
+}
+
+
+def run(n_rows: int, mode: str) -> None:
+    """
+    1回分の計測（別プロセスで実行される）
+    """
+    import logging
+    import warnings
+
+    warnings.simplefilter('ignore')
+    logging.disable(logging.WARNING)
+    legacy, copy_on_write = MODES[mode]
+    pd.set_option('mode.copy_on_write', copy_on_write)
+    # 設定ファイルは作業ディレクトリからの相対パスで読み込まれる
+    os.chdir(ROOT)
+
+    from salary_data_processor import SalaryDataProcessor
+    from utils.memory_profile import StageProfiler
+
+    class LegacySalaryDataProcessor(SalaryDataProcessor):
+        """変更前のコピー（読み込みデータの深いコピー・列名変更時のコピー・2回目の呼び出しでの再処理）を再現"""
+
+        def process_data(self, profiler=None):
+            self.processed = False
+            return super().process_data(profiler)
+
+        def _convert_numeric_columns(self, df):
+            # 変更前は process_data の開始時に self.df.copy() していた
+            return super()._convert_numeric_columns(df.copy())
+
+        def _transform_columns(self, df):
+            # 変更前は df.rename(columns=...) で新しいデータフレームを作成していた
+            return super()._transform_columns(df.copy())
+
+    processor_class = LegacySalaryDataProcessor if legacy else SalaryDataProcessor
+    csv = make_salary_csv(n_rows)
+
+    # 初回のみの処理（設定ファイル・モジュールの読み込み等）を計測に含めないよう、少ない行数で1回実行
+    processor_class(io.BytesIO(make_salary_csv(100))).process_data()
+
+    # 段階ごとの計測
+    profiler = StageProfiler()
+    detail, _ = processor_class(io.BytesIO(csv)).process_data(profiler)
+    assert detail is not None
+
+    # ページの呼び出し順（process_uploaded_data → process_data）での処理全体
+    processor = processor_class(io.BytesIO(csv))
+    with profiler.stage('ページの処理全体'):
+        processor.process_uploaded_data()
+        page_detail, _ = processor.process_data()
+    pd.testing.assert_frame_equal(detail, page_detail)
+
+    print(f"{mode}（Copy-on-Write: {'有効' if copy_on_write else '無効'}） / 行数: {n_rows:,}")
+    print(profiler.report().to_string(index=False, float_format='{:.1f}'.format))
+    print()
+
+
+def main(n_rows: int = 100_000) -> None:
+    for mode in MODES:
+        subprocess.run([sys.executable, __file__, str(n_rows), '--run', mode], check=True)
+
+
+if __name__ == '__main__':
+    if '--run' in sys.argv:
+        run(int(sys.argv[1]), sys.argv[sys.argv.index('--run') + 1])
+    else:
+        main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
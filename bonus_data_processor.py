@@ -1,11 +1,14 @@
 # bonus_data_processor.py
 
 from base_data_processor import BaseDataProcessor
+from utils.csv_export import to_csv_bytes
 from calculations import (df_output_summary, journal_post, post_eom, get_payee_count, get_total_payment,
                           get_total_transfer_amount)
 
 
 class BonusDataProcessor(BaseDataProcessor):
+    schema_section = 'bonus'
+
     columns_order = [
         '会社NO', '対象年月', 'コード', '氏名', '原価区分', '所属', '所属名', '所属コード1',
         '所属コード1名', '事業所', '事業所名', '部門', '部門名', '賞与額計', '健康保険',
@@ -62,50 +65,21 @@ class BonusDataProcessor(BaseDataProcessor):
         # '雇用形態名': {'': '役員', '契約社員': '正社員', 'パート': 'アルバイト'}  # 雇用形態の変換ルール
     }
 
-    conditional_rules = [
-        (lambda df: df['所属名'] == '代表取締役社長', '雇用形態名', lambda df: df['所属名']),
-        (lambda df: df['所属名'] == '取締役', '雇用形態名', lambda df: df['所属名']),
-        (lambda df: df['所属名'] == '監査役', '雇用形態名', lambda df: df['所属名']),
-
-        (lambda df: df['所属名'] == '部長', '所属', lambda df: df['部署コード1']),
-        (lambda df: df['所属名'] == '部長', '所属名', lambda df: df['部署コード1名']),
-        (lambda df: df['所属名'] == 'ＩＴマイスター', '所属', lambda df: df['部署コード1']),
-        (lambda df: df['所属名'] == 'ＩＴマイスター', '所属名', lambda df: df['部署コード1名']),
-        (lambda df: df['所属'] == 90, '所属名', lambda df: df['部署コード1名']),
-
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 1, 'ｾｸﾞﾒﾝﾄ', 9001),  # 一般
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 2, 'ｾｸﾞﾒﾝﾄ', 2200),  # FM
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 3, 'ｾｸﾞﾒﾝﾄ', 3201),  # KURUTO（物産）
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 4, 'ｾｸﾞﾒﾝﾄ', 3202),  # KURUTO（ｶﾌｪ）
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 5, 'ｾｸﾞﾒﾝﾄ', 1900),  # ワクチンCC ー＞ 3サービス共通へ
-
-        (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 31) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 1900),
-        # コンシューマ
-        (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 21) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 1900),  # 技術
-        (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 71) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 2300),
-        # 地域サポート
-        (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 18) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 3101),
-        # にぎわい創生課
-        (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 37) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 1409),
-        # ソリューション課
-        (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 63) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 2100),  # 編成課
-        (lambda df: (df['雇用形態'] > 1) & (df['部署コード1'] == 64) & (df['ｾｸﾞﾒﾝﾄ'] == 9001), 'ｾｸﾞﾒﾝﾄ', 2100),  # 制作課
-
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 9001, 'ｾｸﾞﾒﾝﾄ名', '共通経費'),
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 1900, 'ｾｸﾞﾒﾝﾄ名', '3ｻｰﾋﾞｽ共通'),
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 2100, 'ｾｸﾞﾒﾝﾄ名', 'ｺﾐｭﾆﾃｨCH'),
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 2200, 'ｾｸﾞﾒﾝﾄ名', 'ｺﾐｭﾆﾃｨFM'),
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 2300, 'ｾｸﾞﾒﾝﾄ名', 'ﾌﾘｰﾍﾟｰﾊﾟｰ'),
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 1409, 'ｾｸﾞﾒﾝﾄ名', 'ｿﾘｭｰｼｮﾝ'),
-        (lambda df: df['ｾｸﾞﾒﾝﾄ'] == 3101, 'ｾｸﾞﾒﾝﾄ名', 'ｲﾍﾞﾝﾄ'),
-    ]
+    # 条件付き置き換えルールは設定ファイル（bonus.conditional_rules）で定義
 
-    def __init__(self, file_path, encoding='cp932'):
+    def __init__(self, file_path, encoding=None):
         super().__init__(file_path, encoding)
 
     def process_data(self):
         super().process_data()
 
+        # 列の並び替え・列名変更・コード変換の後に条件付き置き換え（ルールは変換後のカラム名・コードで判定）
+        self.rearrange_df_columns()
+        self.rename_df_columns()
+        self.add_total_columns()
+        self.apply_replace_values()
+        self.apply_conditional_replace()
+
         # 集計関数を呼び出し、結果を属性に保存
         group_by_columns = ['原価区分', '雇用形態', '雇用形態名', '部署コード1', '部署コード1名', '所属', '所属名',
                             'ｾｸﾞﾒﾝﾄ', 'ｾｸﾞﾒﾝﾄ名']
@@ -135,6 +109,6 @@ class BonusDataProcessor(BaseDataProcessor):
 
                 :param df: 変換するpandas DataFrame
                 :param index: CSV出力にインデックスを含めるかどうか
-                :return: CSV形式の文字列
+                :return: CSV形式のバイトデータ（cp932）
                 """
-        return df.to_csv(index=index).encode('cp932')
+        return to_csv_bytes(df, index=index, encoding='cp932')
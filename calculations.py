@@ -1,5 +1,6 @@
 # calculations.py
 
+import numpy as np
 import pandas as pd
 
 
@@ -13,7 +14,7 @@ def df_output_summary(df, group_by_columns, sum_columns):
     :return: 集計されたデータフレーム
     """
     summary_df = df[group_by_columns + sum_columns]
-    output_all = summary_df.groupby(group_by_columns).sum()
+    output_all = summary_df.groupby(group_by_columns, observed=True).sum()
 
     return output_all
 
@@ -28,7 +29,7 @@ def journal_post(df, group_by_columns, sum_columns):
         :return: 集計されたデータフレーム
         """
     journal_df = df[group_by_columns + sum_columns]
-    output_journal_payment = journal_df.groupby(group_by_columns).sum()
+    output_journal_payment = journal_df.groupby(group_by_columns, observed=True).sum()
 
     return output_journal_payment
 
@@ -45,7 +46,7 @@ def post_eom(df, group_by_columns, melt_columns, exclude_columns=None):
         """
     eom_df = df[group_by_columns + melt_columns]
     df_melt = eom_df.melt(id_vars=group_by_columns, var_name='区分', value_name='金額').query('区分 not in @exclude_columns')
-    df_post_eom = df_melt.groupby(group_by_columns + ['区分']).sum().sort_values(['区分', '雇用形態'])
+    df_post_eom = df_melt.groupby(group_by_columns + ['区分'], observed=True).sum().sort_values(['区分', '雇用形態'])
 
     return df_post_eom
 
@@ -82,3 +83,195 @@ def get_total_transfer_amount(df, pay_column):
     """
     total_amount = df[pay_column].sum()
     return total_amount
+
+
+# bincount（float64）で誤差なく合計できる整数の上限
+_EXACT_FLOAT_LIMIT = 2 ** 53
+
+
+def _sum_by_group(group_ids, values, n_groups):
+    """
+    グループ番号ごとに値を合計します（整数は誤差なく合計）。
+
+    :param group_ids: 行ごとのグループ番号（0始まり）
+    :param values: 合計する値
+    :param n_groups: グループ数
+    :return: グループごとの合計
+    """
+    if values.dtype.kind in 'iub':
+        values = values.astype(np.int64)
+        if len(values) == 0 or int(np.abs(values).max()) * len(values) < _EXACT_FLOAT_LIMIT:
+            return np.rint(np.bincount(group_ids, weights=values, minlength=n_groups)).astype(np.int64)
+        sums = np.zeros(n_groups, dtype=np.int64)
+        np.add.at(sums, group_ids, values)
+        return sums
+    return np.bincount(group_ids, weights=values.astype(float), minlength=n_groups)
+
+
+def _expand_formulas(columns, formulas):
+    """
+    合計列の定義を元の列の係数に展開します（先に定義した合計列の参照は、その係数に置き換え）。
+
+    :param columns: データフレームの列
+    :param formulas: 合計列名 → 対象列のリストまたは {列名: 係数} の辞書（定義順）
+    :return: (合計列名 → {元の列: 係数} の辞書, 合計列名 → 存在しない対象列のリストの辞書（存在しない列がある合計列のみ）)
+    """
+    expanded = {}
+    missing = {}
+    for name, terms in formulas.items():
+        items = terms.items() if isinstance(terms, dict) else [(col, 1) for col in terms]
+        coefs = {}
+        found = False
+        for col, coef in items:
+            if col in expanded:
+                for base, base_coef in expanded[col].items():
+                    coefs[base] = coefs.get(base, 0) + coef * base_coef
+            elif col in columns:
+                coefs[col] = coefs.get(col, 0) + coef
+            else:
+                missing.setdefault(name, []).append(col)
+                continue
+            found = True
+        if found:
+            expanded[name] = coefs
+    return expanded, missing
+
+
+def compute_totals(df, formulas):
+    """
+    複数の合計列を、対象列をまとめた1つの行列と係数行列の積で一括計算します。
+    対象列には先に定義した合計列も指定でき、定義順に展開して計算します（列の追加・コピーは行わない）。
+    存在しない列は除いて合計し（合計列ごとに返す）、欠損値は0として合計します。
+    対象列が全て整数型の合計列は整数で返します。
+
+    :param df: データフレーム
+    :param formulas: 合計列名 → 対象列のリスト（係数1）または {列名: 係数} の辞書（定義順）
+    :return: (合計列名 → 値の配列の辞書（定義順、対象列が1つも存在しない合計列は含まない）,
+              合計列名 → 存在しない対象列のリストの辞書)
+    """
+    expanded, missing = _expand_formulas(set(df.columns), formulas)
+    if not expanded:
+        return {}, missing
+
+    columns = list(dict.fromkeys(col for coefs in expanded.values() for col in coefs))
+    position = {col: i for i, col in enumerate(columns)}
+    indicator = np.zeros((len(columns), len(expanded)))
+    for j, coefs in enumerate(expanded.values()):
+        for col, coef in coefs.items():
+            indicator[position[col], j] = coef
+
+    # 列ごとに連続した1つの行列に集める
+    matrix = np.empty((len(df), len(columns)), order='F')
+    for i, col in enumerate(columns):
+        series = df[col]
+        if isinstance(series.dtype, np.dtype):
+            matrix[:, i] = series.to_numpy()
+        else:
+            matrix[:, i] = series.to_numpy(dtype=float, na_value=np.nan)
+    if np.isnan(matrix).any():
+        np.nan_to_num(matrix, copy=False, nan=0.0)
+    totals = matrix @ indicator
+
+    is_integer = {col: pd.api.types.is_integer_dtype(df[col]) or pd.api.types.is_bool_dtype(df[col])
+                  for col in columns}
+    column_max = np.maximum(matrix.max(axis=0, initial=0), -matrix.min(axis=0, initial=0))
+    results = {}
+    for j, (name, coefs) in enumerate(expanded.items()):
+        values = totals[:, j]
+        if all(is_integer[col] for col in coefs) and all(float(c).is_integer() for c in coefs.values()):
+            # 各列の絶対値の最大×係数の合計が上限未満であれば、浮動小数点の積でも誤差はない
+            bound = np.abs(indicator[:, j]) @ column_max
+            if bound < _EXACT_FLOAT_LIMIT:
+                values = np.rint(values).astype(np.int64)
+            else:
+                # 浮動小数点では誤差が出る大きさの場合は整数のまま計算
+                values = np.column_stack([df[col].to_numpy(dtype=np.int64) for col in coefs]) @ \
+                    np.array([int(c) for c in coefs.values()], dtype=np.int64)
+        results[name] = values
+    return results, missing
+
+
+class GroupedSum:
+    """
+    キー列ごとの合計を積み上げる集計（チャンク・複数ファイルの部分集計を結合可能）。
+    結果は df.groupby(group_columns)[value_column].sum().reset_index() と同じ。
+    """
+
+    def __init__(self, group_columns, value_column):
+        """
+        :param group_columns: グループ化する列のリスト
+        :param value_column: 合計する列
+        """
+        self.group_columns = list(group_columns)
+        self.value_column = value_column
+        self._partials = []
+        self._result = None
+
+    def _reduce(self, df):
+        """
+        キー列を整数コードに変換し、グループごとに合計した部分集計を作成します。
+        （キーが欠損値の行はgroupbyと同様に除外）
+
+        :param df: 集計するデータフレーム
+        :return: 部分集計（キー列と合計列、出現順）
+        """
+        n_rows = len(df)
+        group_ids = np.zeros(n_rows, dtype=np.int64)
+        valid = np.ones(n_rows, dtype=bool)
+        for col in self.group_columns:
+            codes, uniques = pd.factorize(df[col], use_na_sentinel=True)
+            valid &= codes >= 0
+            # 組み合わせのコードを詰め直して桁あふれを防ぐ
+            group_ids, _ = pd.factorize(group_ids * (len(uniques) + 1) + codes + 1)
+
+        if not valid.all():
+            df = df[valid]
+            group_ids, _ = pd.factorize(group_ids[valid])
+
+        n_groups = int(group_ids.max()) + 1 if len(group_ids) else 0
+        first_rows = np.full(n_groups, len(group_ids), dtype=np.int64)
+        np.minimum.at(first_rows, group_ids, np.arange(len(group_ids)))
+
+        partial = df.iloc[first_rows, df.columns.get_indexer(self.group_columns)].reset_index(drop=True)
+        partial[self.value_column] = _sum_by_group(group_ids, df[self.value_column].to_numpy(), n_groups)
+        return partial
+
+    def add(self, df):
+        """
+        データフレームを部分集計して積み上げます。
+
+        :param df: 集計するデータフレーム
+        :return: self
+        """
+        self._partials.append(self._reduce(df))
+        self._result = None
+        return self
+
+    def merge(self, other):
+        """
+        別の集計（他のファイル・チャンク）の部分集計を取り込みます。
+
+        :param other: 同じキー列・合計列のGroupedSum
+        :return: self
+        """
+        if other.group_columns != self.group_columns or other.value_column != self.value_column:
+            raise ValueError('集計キーまたは合計列が一致しません')
+        self._partials.extend(other._partials)
+        self._result = None
+        return self
+
+    def result(self):
+        """
+        積み上げた部分集計を結合し、キー順に並べた集計結果を返します。
+
+        :return: 集計されたデータフレーム
+        """
+        if self._result is None:
+            if self._partials:
+                merged = pd.concat(self._partials, ignore_index=True)
+            else:
+                merged = pd.DataFrame(columns=self.group_columns + [self.value_column])
+            # 部分集計は小さいため、並び順の決定は通常のgroupbyに任せる
+            self._result = merged.groupby(self.group_columns, sort=True)[self.value_column].sum().reset_index()
+            self._partials = [self._result]
+        return self._result
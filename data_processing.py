@@ -1,6 +1,9 @@
 # data_processing.py
 
+import numpy as np
 import pandas as pd
+from utils.code_remapper import CodeRemapper
+from utils.csv_export import to_csv_bytes
 
 
 def load_df(file, encoding='cp932'):
@@ -14,19 +17,6 @@ def load_df(file, encoding='cp932'):
     return pd.read_csv(file, encoding=encoding)
 
 
-def add_total_column(df, column_list, new_column_name):
-    """
-        指定された複数の列の合計を新しい列として追加する。
-
-        :param df: データフレーム
-        :param column_list: 合計する列のリスト
-        :param new_column_name: 新しい列の名前
-        :return: 更新されたデータフレーム
-        """
-    df[new_column_name] = df[column_list].sum(axis=1)
-    return df
-
-
 def rearrange_columns(df, new_order):
     """
     データフレームの列を指定された順序で並べ替える。
@@ -49,37 +39,71 @@ def rename_columns(df, rename_dict):
     return df.rename(columns=rename_dict)
 
 
-def replace_values(df, column, replace_dict):
+def replace_codes(series, replace_dict):
     """
-    指定した列の値を辞書に基づいて置換する。
+    整数コードの列を辞書に基づいて一括変換し、変換対象外のコードも返す。
+    （キーが整数でない辞書・数値以外の列は Series.replace で置換する）
 
-    :param df: データフレーム。
-    :param column: 値を置換する列名。
+    :param series: 値を置換する列。
     :param replace_dict: 置換ルールの辞書。
-    :return: 値が置換されたデータフレーム。
+    :return: (置換後の列, 変換対象外のコードのリスト)
     """
-    df[column] = df[column].replace(replace_dict)
-    return df
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        try:
+            return CodeRemapper.from_mapping(replace_dict).remap(series)
+        except (TypeError, ValueError):
+            pass
+    return series.replace(replace_dict), []
 
 
-def conditional_replace(df, condition, target_column, new_value):
+def _truncate_to_int(series):
     """
-    条件に基づいて特定の列の値を変更する。
+    数値の列を0方向に切り捨てて整数化する（int(x) と同じ丸め）。
+
+    :param series: 数値型の列
+    :return: 整数化した列（欠損値がなければint64、あればInt64）
+    """
+    if pd.api.types.is_integer_dtype(series) and not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype('Int64') if series.hasnans else series.astype(np.int64)
+
+    values = series.to_numpy(dtype=float, na_value=np.nan)
+    missing = np.isnan(values)
+    truncated = np.trunc(np.where(missing, 0, values))
+    if np.isinf(truncated).any() or (np.abs(truncated) >= 2 ** 63).any():
+        raise OverflowError(f"{series.name}: int64に変換できない値が含まれています")
+    integers = truncated.astype(np.int64)
+    if missing.any():
+        return pd.Series(pd.arrays.IntegerArray(integers, missing), index=series.index, name=series.name)
+    return pd.Series(integers, index=series.index, name=series.name)
+
 
-    :param df: データフレーム。
-    :param condition: 変更を適用する条件（ブール式）。
-    :param target_column: 値を変更する列名。
-    :param new_value: 新しい値。
-    :return: 値が変更されたデータフレーム。
+def to_integer(series):
     """
-    # 条件に基づいて指定された列の値を変更
-    if callable(new_value):
-        # 新しい値がラムダ式の場合、データフレームに適用
-        df[target_column] = df[target_column].mask(condition, new_value(df))
-    else:
-        # 新しい値が固定値の場合
-        df[target_column] = df[target_column].mask(condition, new_value)
-    return df
+    列を整数に変換する（.apply(lambda x: int(x)) のベクトル化版）。
+
+    :param series: 変換する列（数値型以外は要素ごとにint()で変換）
+    :return: 整数化した列（欠損値がなければint64、あればInt64）
+    """
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return series.apply(lambda x: int(x))
+    return _truncate_to_int(series)
+
+
+def to_code_string(series):
+    """
+    コード列を整数表記の文字列に変換する（.apply(lambda x: str(int(x))) のベクトル化版）。
+    float型（欠損値を含む）の列はInt64を経由して変換し、欠損値は欠損値のまま残す。
+
+    :param series: 変換するコード列（数値型以外は要素ごとにstr(int())で変換）
+    :return: 文字列（object型）の列
+    """
+    if pd.api.types.is_bool_dtype(series) or not pd.api.types.is_numeric_dtype(series):
+        return series.apply(lambda x: str(int(x)))
+
+    # コードの種類は少ないため、一意な値だけを文字列化して展開する
+    codes, uniques = pd.factorize(_truncate_to_int(series), use_na_sentinel=True)
+    labels = np.array([str(int(value)) for value in uniques] + [np.nan], dtype=object)
+    return pd.Series(labels[codes], index=series.index, name=series.name, dtype=object)
 
 
 def convert_df_to_csv(df, index=False):
@@ -88,6 +112,6 @@ def convert_df_to_csv(df, index=False):
 
     :param df: 変換するpandas DataFrame
     :param index: CSV出力にインデックスを含めるかどうか
-    :return: CSV形式の文字列
+    :return: CSV形式のバイトデータ（cp932）
     """
-    return df.to_csv(index=index).encode('cp932')
+    return to_csv_bytes(df, index=index, encoding='cp932')
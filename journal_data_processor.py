@@ -1,3 +1,11 @@
+# journal_data_processor.py
+
+import pandas as pd
+import streamlit as st
+from base_data_processor import BaseDataProcessor
+from utils.csv_export import to_csv_bytes
+
+
 class JournalDataProcessor(BaseDataProcessor):
     """会計システム連携データ処理クラス"""
 
@@ -57,7 +65,7 @@ class JournalDataProcessor(BaseDataProcessor):
                 st.warning("出力可能なデータが存在しません")
                 return b""  # 空のバイトデータを返す
 
-            return self.df.to_csv(index=index).encode(self.encoding)
+            return to_csv_bytes(self.df, index=index, encoding=self.encoding)
 
         except Exception as e:
             st.error(f"CSV変換エラー: {str(e)}")
@@ -0,0 +1,401 @@
+# journal_processing.py
+
+import calendar
+import datetime
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pandas as pd
+
+from calculations import GroupedSum
+from data_processing import to_code_string, to_integer, load_df
+from utils.journal_rules import OUT_OF_RANGE, get_journal_rules
+
+
+def get_year_month_from_file(file):
+    """
+    ファイル名から年月文字列を取得（ファイル名の文字列も指定可能）
+    """
+    file_name = getattr(file, 'name', file).split('.')[0].split('_')[-1]
+    return file_name
+
+
+def get_end_of_month_date(str_yyyymm):
+    """
+    ファイル名から月末日付を取得
+    """
+    year = int(str_yyyymm[:4])
+    month = int(str_yyyymm[-2:])
+    last_day = calendar.monthrange(year, month)[1]
+
+    eom = datetime.date(year, month, last_day).strftime('%Y/%m/%d')
+    return eom
+
+
+# --- 仕訳データの読み込み ----
+# カラム名変更用辞書（一次処理、振替伝票の出力順）
+JOURNAL_COLUMNS = {
+    '借方科目コード': 'dr_cd',
+    '借方科目名称': 'dr_name',
+    '借方科目別補助コード': 'dr_sub_cd',
+    '借方科目別補助名称': 'dr_sub_name',
+    '借方部門コード': 'dr_section_cd',
+    '借方部門名称': 'dr_section_name',
+    '借方セグメント2': 'dr_segment_cd',
+    '借方セグメント２名称': 'dr_segment_name',
+    '貸方科目コード': 'cr_cd',
+    '貸方科目名称': 'cr_name',
+    '貸方科目別補助コード': 'cr_sub_cd',
+    '貸方科目別補助名称': 'cr_sub_name',
+    '貸方部門コード': 'cr_section_cd',
+    '貸方部門名称': 'cr_section_name',
+    '貸プセグメント2コード': 'cr_segment_cd',
+    '貸方セグメント２名称': 'cr_segment_name',
+    '金額': 'price',
+    '消費税': 'tax',
+    '摘要': 'outline'
+}
+
+# 名称・摘要は文字列として読み込む（分割読み込みでも型がチャンクごとに変わらないようにする）
+JOURNAL_TEXT_COLUMNS = ['借方科目名称', '借方科目別補助名称', '借方部門名称', '借方セグメント２名称',
+                        '貸方科目名称', '貸方科目別補助名称', '貸方部門名称', '貸方セグメント２名称', '摘要']
+
+# 分割読み込み時の1チャンクの行数
+DEFAULT_CHUNKSIZE = 50_000
+
+# 集計データのキー
+GROUP_COLUMNS = ['ac_cd', 'ac_name', 'sub_cd', 'sub_name', 'section_cd', 'section_name', 'segment_cd', 'segment_name']
+
+
+def read_journal(file, chunksize=None, encoding='cp932'):
+    """
+    振替伝票CSVから変換に使う列だけを読み込む
+    （chunksize指定時はチャンクごとのイテレータを返す）
+    """
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return pd.read_csv(file, encoding=encoding, usecols=lambda col: col in JOURNAL_COLUMNS,
+                       dtype={col: str for col in JOURNAL_TEXT_COLUMNS}, chunksize=chunksize)
+
+
+def filtered_df(df):
+    """
+    並び替えとカラムの整理、リネーム
+    """
+    return df.filter(list(JOURNAL_COLUMNS)).rename(JOURNAL_COLUMNS, axis=1)
+
+
+def convert_df(file):
+    """
+    データの読み込みと変換処理
+    """
+    df = read_journal(file)
+    filtered = filtered_df(df)
+    return filtered
+
+
+# -- 借方・貸方データの整形処理 --
+ENTRY_COLUMNS = ['ac_cd', 'ac_name', 'sub_cd', 'sub_name', 'section_cd', 'section_name', 'segment_cd',
+                 'segment_name', 'price', 'outline']
+
+
+def _split_side(df, side, rules):
+    """
+    借方/貸方の片側を抽出し、科目区分ごとに符号を付けて並べる
+    （並べ替え後のデータと各行の区分番号を返す）
+    """
+    account_class = rules.classify(df[f'{side}_cd'])
+    selected = np.flatnonzero(account_class != OUT_OF_RANGE)
+    # 区分順（区分内は元の行順）に並べ替え、対象行だけを1回で取り出す
+    order = selected[np.argsort(account_class[selected], kind='stable')]
+
+    columns = [f'{side}_cd', f'{side}_name', f'{side}_sub_cd', f'{side}_sub_name', f'{side}_section_cd',
+               f'{side}_section_name', f'{side}_segment_cd', f'{side}_segment_name']
+    columns += ['price', 'tax', 'outline']
+    positions = df.columns.get_indexer(columns)
+    if (positions < 0).any():
+        # 存在しない列の位置(-1)で取り出すと末尾の列が代わりに使われるため、列の不足はエラーにする
+        raise KeyError([col for col, position in zip(columns, positions) if position < 0])
+    _df = df.iloc[order, positions]
+    _df['price'] = _df['price'] - _df.pop('tax')
+    _df.fillna(0, inplace=True)
+    _df.columns = ENTRY_COLUMNS
+
+    _df['price'] = _df['price'] * rules.signs(account_class[order], side)
+    nonzero = (_df['price'] != 0).to_numpy()
+    return _df[nonzero], account_class[order][nonzero]
+
+
+def split_side(df, side, rules=None):
+    """
+    借方/貸方の片側を抽出し、科目区分ごとに符号を付けて並べる
+    （区分の定義順に連結した結果と同じ行順・値になる）
+    """
+    return _split_side(df, side, rules or get_journal_rules())[0]
+
+
+def calc_dr(df):
+    """
+    借方データの計算処理
+    """
+    return split_side(df, 'dr')
+
+
+def calc_cr(df):
+    """
+    貸方データの計算処理
+    """
+    return split_side(df, 'cr')
+
+
+# -- データ統合 --
+def normalize_entries(df):
+    """
+    コード列を文字列、金額を整数に変換する
+    """
+    for col in ['ac_cd', 'sub_cd', 'section_cd', 'segment_cd']:
+        df[col] = to_code_string(df[col])
+    df['price'] = to_integer(df['price'])
+    return df
+
+
+def concat_df(dr, cr):
+    """
+    借方データと貸方データを結合し、型変換を行う
+    """
+    df = pd.concat([dr, cr]).reset_index(drop=True)
+    df.dropna(subset='ac_cd', inplace=True)
+    return normalize_entries(df)
+
+
+def group_journal(df):
+    """
+    科目・補助科目・部門・セグメントごとに金額を集計する
+    """
+    return GroupedSum(GROUP_COLUMNS, 'price').add(df).result()
+
+
+# -- 分割読み込み --
+def _merge_side(frames, classes):
+    """
+    チャンクごとの抽出結果を結合し、全体を区分順（区分内は元の行順）に並べる
+    """
+    merged = pd.concat(frames)
+    order = np.argsort(np.concatenate(classes), kind='stable')
+    return merged.iloc[order]
+
+
+def _process_chunk(chunk, rules, sides, grouped):
+    """
+    1チャンク分の貸借データを整形し、チャンクごとの結果と小計を追加する
+    """
+    df = filtered_df(chunk)
+    for side, (frames, classes) in sides.items():
+        side_df, side_class = _split_side(df, side, rules)
+        side_df = normalize_entries(side_df)
+        frames.append(side_df)
+        classes.append(side_class)
+        # 集計はチャンクごとの小計を積み上げる
+        grouped.add(side_df)
+
+
+def transform_journal(file, chunksize=DEFAULT_CHUNKSIZE, rules=None):
+    """
+    振替伝票CSVをチャンクごとに読み込み、貸借データの結合結果と集計データを作成する
+    （ピークメモリはファイルサイズではなくチャンクサイズに比例し、結果は一括処理と同じ）
+    """
+    rules = rules or get_journal_rules()
+    sides = {'dr': ([], []), 'cr': ([], [])}
+    grouped = GroupedSum(GROUP_COLUMNS, 'price')
+
+    with read_journal(file, chunksize=chunksize) as chunks:
+        for chunk in chunks:
+            _process_chunk(chunk, rules, sides, grouped)
+
+    if not sides['dr'][0]:
+        # データ行がない場合も同じ列構成の空データを返す
+        _process_chunk(pd.DataFrame(columns=list(JOURNAL_COLUMNS)), rules, sides, grouped)
+
+    df_concat = pd.concat([_merge_side(*sides['dr']), _merge_side(*sides['cr'])]).reset_index(drop=True)
+    return df_concat, grouped.result()
+
+
+# --  Wide to Long 変換 --
+# 集計用区分（大区分・中区分）は設定ファイルの journal.classes で定義
+
+# 縦変換の識別列
+LONG_ID_COLUMNS = ['科目CD', '科目名', '補助科目CD', '補助科目名', '部門CD', '部門名', '集計区分']
+
+
+def _class_categorical(values, class_codes):
+    """
+    区分列の番号から、区分名称のカテゴリ型を作成
+    """
+    # 区分名称は初出順のカテゴリ（区分数は設定ファイルで決まるため、コードはintpで持つ）
+    codes, categories = pd.factorize(np.asarray(values, dtype=object))
+    return pd.Categorical.from_codes(codes[class_codes], categories=categories)
+
+
+def melt_allocation(df, rules=None):
+    """
+    Wide型の配賦データをLong型データに変換し、集計区分を追加する
+    （金額が0・欠損の行は展開前に除外し、識別列・区分列はカテゴリ型で持つ）
+    """
+    rules = rules or get_journal_rules()
+    class_columns = rules.class_columns
+
+    # 識別列の欠損値補完とコード変換は展開前の行数で行い、カテゴリ型にしてから展開する
+    ids = df[LONG_ID_COLUMNS].fillna(0)
+    for col in ['科目CD', '補助科目CD', '部門CD']:
+        ids[col] = to_code_string(ids[col])
+    ids = ids.astype('category')
+
+    # 区分列ごとに縦に並べた順（melt と同じ順）で、金額が0でないセルだけを取り出す
+    amounts = df[class_columns].to_numpy()
+    flat = amounts.ravel(order='F')
+    keep = np.flatnonzero(pd.notna(flat) & (flat != 0))
+    row_idx = keep % len(df) if len(df) else keep
+    class_idx = keep // len(df) if len(df) else keep
+
+    df_long = ids.iloc[row_idx].reset_index(drop=True)
+    df_long['s_class'] = pd.Categorical.from_codes(class_idx, categories=class_columns)
+    df_long['金額'] = flat[keep]
+    df_long['large_class'] = _class_categorical([rules.large_class[col] for col in class_columns], class_idx)
+    df_long['mid_class'] = _class_categorical([rules.mid_class[col] for col in class_columns], class_idx)
+    return df_long
+
+
+# 一連の変換処理
+def load_long_data(file):
+    """
+    配賦データを読み込み、Long型に変換する一連の処理
+    """
+    df = load_df(file)
+    return melt_allocation(df)
+
+
+# Long型データの出力列
+LONG_COLUMNS = ['予算/実績', '期間', '科目CD', '科目名', '補助科目CD', '補助科目名', '部門CD', '部門名', '集計区分', 's_class',
+                'mid_class', 'large_class', '金額']
+
+
+def finalize_long_data(df, flg, str_yyyymm):
+    """
+    Long型データに予算/実績の区分と期間（月末日付）を付けて出力列に整える
+    """
+    df['予算/実績'] = flg if flg in ('実績', '予算') else ''
+    df['期間'] = get_end_of_month_date(str_yyyymm)
+    return df.filter(LONG_COLUMNS)
+
+
+# -- 複数月の一括処理 --
+def _named_buffer(name, data):
+    """
+    アップロードファイルと同様に name 属性を持つバッファを作成
+    """
+    buffer = io.BytesIO(data)
+    buffer.name = name
+    return buffer
+
+
+def _transform_journal_worker(name, data):
+    """
+    振替伝票1ファイル分の変換（プロセスプールのワーカー）
+    """
+    df_concat, pivot_data = transform_journal(_named_buffer(name, data))
+    return get_year_month_from_file(name), df_concat, pivot_data
+
+
+def _load_long_worker(name, data, flg):
+    """
+    配賦データ1ファイル分の縦変換（プロセスプールのワーカー）
+    """
+    str_yyyymm = get_year_month_from_file(name)
+    return str_yyyymm, finalize_long_data(load_long_data(_named_buffer(name, data)), flg, str_yyyymm)
+
+
+# 合計サイズがこの値未満のバッチはプロセスプールを使わずに順に処理する
+# （ワーカーの起動とpandas・streamlitの読み込みに数秒かかるため、通常の月次ファイルでは順に処理する方が速い）
+PARALLEL_MIN_BYTES = 16 * 1024 ** 2
+
+_EXECUTOR = None
+_EXECUTOR_WORKERS = 0
+_EXECUTOR_LOCK = threading.Lock()
+
+
+def _get_executor(max_workers):
+    """
+    バッチ処理用のプロセスプールを取得する
+    （呼び出し間で再利用し、ワーカー数が足りない場合のみ作り直す）
+    """
+    global _EXECUTOR, _EXECUTOR_WORKERS
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is None or _EXECUTOR_WORKERS < max_workers:
+            if _EXECUTOR is not None:
+                _EXECUTOR.shutdown(wait=False)
+            # Streamlitのスレッドを引き継がないよう、ワーカーはspawnで起動する
+            context = multiprocessing.get_context('spawn')
+            _EXECUTOR = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+            _EXECUTOR_WORKERS = max_workers
+        return _EXECUTOR
+
+
+def _discard_executor(executor):
+    """
+    異常終了したプロセスプールを破棄する（次回の呼び出しで作り直す）
+    """
+    global _EXECUTOR, _EXECUTOR_WORKERS
+    with _EXECUTOR_LOCK:
+        if _EXECUTOR is executor:
+            _EXECUTOR = None
+            _EXECUTOR_WORKERS = 0
+    executor.shutdown(wait=False)
+
+
+def _run_batch(worker, files, *args, max_workers=None, min_parallel_bytes=PARALLEL_MIN_BYTES):
+    """
+    ファイルごとの処理をプロセスプールで並列実行する（結果はファイルの指定順）
+    （ファイルの合計サイズが min_parallel_bytes 未満の場合は順に処理する）
+    """
+    periods = [get_year_month_from_file(file) for file in files]
+    duplicated = sorted({period for period in periods if periods.count(period) > 1})
+    if duplicated:
+        raise ValueError(f"同じ年月のファイルが複数あります: {', '.join(duplicated)}")
+
+    jobs = [(file.name, file.getvalue()) for file in files]
+    max_workers = min(len(jobs), max_workers or os.cpu_count() or 1)
+    if max_workers <= 1 or sum(len(data) for _, data in jobs) < min_parallel_bytes:
+        return [worker(name, data, *args) for name, data in jobs]
+
+    executor = _get_executor(max_workers)
+    try:
+        futures = [executor.submit(worker, name, data, *args) for name, data in jobs]
+        return [future.result() for future in futures]
+    except BrokenProcessPool:
+        _discard_executor(executor)
+        raise
+
+
+def transform_journal_batch(files, max_workers=None):
+    """
+    複数月の振替伝票を並列に変換し、月ごとの変換結果と集計データを返す
+    （戻り値は 年月 → (貸借結合データ, 集計データ) の辞書、年月順）
+    """
+    results = _run_batch(_transform_journal_worker, files, max_workers=max_workers)
+    return {str_yyyymm: (df_concat, pivot_data) for str_yyyymm, df_concat, pivot_data in sorted(results, key=lambda r: r[0])}
+
+
+def load_long_batch(files, flg, max_workers=None):
+    """
+    複数月の配賦データを並列に縦変換し、期間列付きの1つのLong型データに結合する（期間順）
+    """
+    results = _run_batch(_load_long_worker, files, flg, max_workers=max_workers)
+    frames = [df for _, df in sorted(results, key=lambda r: r[0])]
+    if not frames:
+        return pd.DataFrame(columns=LONG_COLUMNS)
+    return pd.concat(frames, ignore_index=True)
@@ -1,5 +1,9 @@
+import pandas as pd
 import streamlit as st
 
+# pandasのCopy-on-Write（列の選択・浅いコピーでデータを複製せず、変更時のみコピーする）
+pd.set_option('mode.copy_on_write', True)
+
 def main():
     st.set_page_config(layout='wide', page_icon=":material/home_repair_service:")
     st.title('経理データ処理ツール')
@@ -1,7 +1,10 @@
 import streamlit as st
+import pandas as pd
 from salary_data_processor import SalaryDataProcessor
 from bonus_data_processor import BonusDataProcessor
-from data_processing import convert_df_to_csv
+from utils.config_loader import get_config_loader
+from utils.data_cache import content_hash, get_session_cache
+from utils.download import DownloadArtifact
 
 
 def display_file_upload() -> 'pd.DataFrame':
@@ -121,35 +124,65 @@ def display_processed_data_detail(processed_df: 'pd.DataFrame') -> None:
         st.dataframe(processed_df, use_container_width=True, hide_index=True)
 
 
-def display_accounting_data(processed_df: 'pd.DataFrame', processor) -> None:
+# 会計システム連携用データの集計キー
+ACCOUNTING_GROUP_COLUMNS = ['原価区分', '部門コード', '部門', '部署コード', '部署', '雇用区分コード', '雇用区分', 'セグメントコード', 'セグメント']
+# 月末計上仕訳の集計キー（集計キーと同じ列を仕訳用の順序に並べたもの）
+ACCOUNTING_MELT_INDEX_COLUMNS = ['原価区分', '雇用区分コード', '雇用区分', '部門コード', '部門', '部署コード', '部署', 'セグメントコード', 'セグメント']
+ACCOUNTING_MELT_COLUMNS = ['基本給', '資格手当合計', '時間外勤務手当合計', 'その他手当合計', '通勤手当合計']
+ACCOUNTING_DEDUCTION_COLUMNS = ['P健保介護', '厚生年金個人', '雇用保険', '所得税', '住民税', '年調過不足', '加入者拠出', 'ランチ弁当代', 'ﾜｰｸﾘｨ知多',
+                                '自動車保険', 'ＣＭ会費', 'ＴＧ特別医療', '会社立替精算', 'その他控除', '控除合計', '健保給付金等', '差引支給額',
+                                '差引支給＿負', '振込金額']
+
+
+def build_accounting_views(df: 'pd.DataFrame') -> tuple:
     """
-    会計システム連携用のデータを表示し、ダウンロード機能を提供する。
+    会計システム連携用の3つのデータ（全体・月末計上・支払切返）を作成する。
+    集計は1回だけ行い、各データは集計結果の列の選択・並べ替え・縦持ち変換で作成する。
+
+    Args:
+        df: 変換後の全項目データ
+
+    Returns:
+        tuple: (全体, 月末計上仕訳用, 支払仕訳用)
     """
-    if processed_df is None:
-        return processed_df
+    agg_dict = {col: 'sum' for col in df.columns
+                if col not in ACCOUNTING_GROUP_COLUMNS and pd.api.types.is_numeric_dtype(df[col])}
+    grouped = df.groupby(ACCOUNTING_GROUP_COLUMNS, as_index=False, observed=True).agg(agg_dict)
 
-    df = processed_df.copy()
-    group_cols = ['原価区分', '部門コード', '部門', '部署コード', '部署', '雇用区分コード', '雇用区分', 'セグメントコード', 'セグメント']
-    # --- グルーピング集計---
-    agg_cols = [col for col in df.columns if col not in group_cols]
-    agg_dict = {col: 'sum' for col in agg_cols if df[col].dtype != 'object'}
-    grouped_all = df.groupby(group_cols, as_index=False).agg(agg_dict).query('振込金額 != 0')
+    # --- 全体 ---
+    grouped_all = grouped.query('振込金額 != 0')
 
-    # --- 縦持ちデータへの変換 ---
-    # カラム範囲を取得
-    melt_idx_cols = ['原価区分', '雇用区分コード', '雇用区分', '部門コード', '部門', '部署コード', '部署', 'セグメントコード', 'セグメント']
-    melt_cols = ['基本給', '資格手当合計', '時間外勤務手当合計', 'その他手当合計', '通勤手当合計']
+    # --- 月末計上仕訳用（縦持ちデータ） ---
+    # 集計キーの順序が異なるため、月末計上仕訳用のキー順で並べ替える（集計キーは一意なので並び順は一意）
+    grouped_for_melt = (grouped[ACCOUNTING_MELT_INDEX_COLUMNS + ACCOUNTING_MELT_COLUMNS]
+                        .sort_values(ACCOUNTING_MELT_INDEX_COLUMNS)
+                        .reset_index(drop=True))
+    melted = grouped_for_melt.melt(id_vars=ACCOUNTING_MELT_INDEX_COLUMNS, value_vars=ACCOUNTING_MELT_COLUMNS,
+                                   var_name='項目', value_name='金額')
+    df_post_eom = melted.query('金額 != 0')
 
-    grouped_for_melt = df.groupby(melt_idx_cols, as_index=False).agg(agg_dict)
-    melted = grouped_for_melt.melt(id_vars=melt_idx_cols, value_vars=melt_cols, var_name='項目', value_name='金額')
+    # --- 支払仕訳用 ---
+    df_journal = grouped[ACCOUNTING_GROUP_COLUMNS + ACCOUNTING_DEDUCTION_COLUMNS].query('原価区分 != 0')
+
+    return grouped_all, df_post_eom, df_journal
+
+
+def display_accounting_data(processed_df: 'pd.DataFrame', processor, data_key=None) -> None:
+    """
+    会計システム連携用のデータを表示し、ダウンロード機能を提供する。
+    集計結果・ダウンロード用CSVは data_key（入力ファイルのハッシュ・区分・設定ファイルの版）ごとに初回のみ作成する。
+    """
+    if processed_df is None:
+        return processed_df
 
-    # --- 支払仕訳用データ ---
-    deducation_cols = ['P健保介護','厚生年金個人', '雇用保険', '所得税', '住民税', '年調過不足', '加入者拠出', 'ランチ弁当代', 'ﾜｰｸﾘｨ知多',	'自動車保険', 'ＣＭ会費',
-                        'ＴＧ特別医療', '会社立替精算', 'その他控除', '控除合計', '健保給付金等', '差引支給額', '差引支給＿負', '振込金額']
+    # タブの切替・再実行では再集計しない
+    if data_key is not None:
+        grouped_all, df_post_eom, df_journal = get_session_cache('salary_results').get_or_compute(
+            (data_key, 'accounting'), lambda: build_accounting_views(processed_df))
+    else:
+        grouped_all, df_post_eom, df_journal = build_accounting_views(processed_df)
 
-    agg_cols_deducation = [col for col in df.columns if col not in group_cols]
-    agg_dict_deducation = {col: 'sum' for col in agg_cols_deducation if df[col].dtype != 'object'}
-    grouped_deduction = df.groupby(group_cols, as_index=False).agg(agg_dict_deducation)[group_cols + deducation_cols].query('原価区分 != 0')
+    downloads = get_session_cache('salary_downloads') if data_key is not None else None
 
     tab1, tab2, tab3 = st.tabs(["全体", "月末計上", "支払切返"])
 
@@ -157,27 +190,22 @@ def display_accounting_data(processed_df: 'pd.DataFrame', processor) -> None:
         st.write('### - 全体 -')
         st.dataframe(grouped_all, hide_index=True)
         st.write('ダウンロード')
-        csv = convert_df_to_csv(grouped_all, index=False)
-        st.download_button(
-            label='変換データ', data=csv, file_name='result_details.csv', mime='text/csv')
+        DownloadArtifact((data_key, 'all'), lambda: grouped_all, downloads).download_button(
+            label='変換データ', file_name='result_details.csv')
 
     with tab2:
         st.write('### - 月末計上仕訳用 -')
-        df_post_eom = melted.query('金額 != 0')
-        post_eom_csv = convert_df_to_csv(df_post_eom, index=False)
         st.dataframe(df_post_eom, hide_index=True)
         st.write('ダウンロード')
-        st.download_button(
-            label='月末計上仕訳', data=post_eom_csv, file_name='result_journal_eom.csv', mime='text/csv')
+        DownloadArtifact((data_key, 'eom'), lambda: df_post_eom, downloads).download_button(
+            label='月末計上仕訳', file_name='result_journal_eom.csv')
 
     with tab3:
         st.write('### - 支払仕訳 -')
-        df_journal = grouped_deduction
         st.dataframe(df_journal, hide_index=True)
         st.write('ダウンロード')
-        csv_journal = convert_df_to_csv(df_journal, index=False)
-        st.download_button(
-            label='支払仕訳', data=csv_journal, file_name='result_journal_payment.csv', mime='text/csv')
+        DownloadArtifact((data_key, 'payment'), lambda: df_journal, downloads).download_button(
+            label='支払仕訳', file_name='result_journal_payment.csv')
 
 
 def app():
@@ -211,7 +239,10 @@ def app():
                 
                 st.subheader('会計システム連携加工用データ', divider='blue')
                 # 会計システム連携加工用データ
-                display_accounting_data(processed_df_detail, processor)
+                # 処理結果は設定ファイルに依存するため、設定ファイルの版もキーに含める
+                display_accounting_data(processed_df_detail, processor,
+                                        data_key=content_hash(uploaded_file, data_type=data_type,
+                                                              config_version=get_config_loader().version))
         
         except Exception as e:
             st.error(f"予期せぬエラーが発生しました: {str(e)}")
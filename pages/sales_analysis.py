@@ -3,14 +3,16 @@ from plotly import graph_objects as go
 import plotly.express as px
 from sales_data import SalesData
 from config.sales_payment_config import PaymentConfig
+from utils.data_cache import get_session_cache
+from utils.download import DownloadArtifact
 
 def app():
     """売上分析アプリケーションのメインページ"""
     
     st.header(':material/dataset: 課金システム売上集計処理(Symphonizer抽出データ）', divider='gray')
     
-    # データ処理クラスのインスタンス化
-    sales_data = SalesData()
+    # データ処理クラスのインスタンス化（読み込み結果はセッション内でキャッシュ）
+    sales_data = SalesData(cache=get_session_cache('sales_data'))
     config = PaymentConfig()
 
     # サイドバーのファイルアップロード部分
@@ -69,7 +71,7 @@ def app():
 
         # サマリー情報の表示
         with st.expander('サマリー', expanded=True):
-            summary = sales_data.calculate_summary(filtered_data)
+            summary = sales_data.summarize(payment_methods, include_advance, include_non_sales)
             
             col1, col2, col3 = st.columns([1, 1, 2])
             with col1:
@@ -77,10 +79,24 @@ def app():
                 st.metric('請求顧客数', f'{summary["customer_count"]:,}件')
             with col2:
                 st.metric('平均単価', f'{summary["average_price"]:,.1f}円')
+            with col3:
+                st.dataframe(
+                    summary['by_payment'],
+                    hide_index=True,
+                    column_config={
+                        'MEI_NAME_V': '支払手段',
+                        'SEIKYU_TOTAL': st.column_config.NumberColumn('金額', format='%d'),
+                        'CUSTOMER_COUNT': st.column_config.NumberColumn('顧客数', format='%d'),
+                        'AVERAGE_PRICE': st.column_config.NumberColumn('平均単価', format='%.1f'),
+                    }
+                )
 
             # グラフの表示
-            chart = sales_data.create_payment_chart_data(filtered_data)
-            fig = px.bar(chart, x='MEI_NAME_V', y='SEIKYU_TOTAL', color='SEIKYU_TOTAL', color_continuous_scale='tealrose')
+            # （支払方法別に集計済みのデータのみを渡す）
+            chart = sales_data.payment_chart_data(payment_methods, include_advance, include_non_sales)
+            fig = px.bar(chart, x='MEI_NAME_V', y='SEIKYU_TOTAL', color='SEIKYU_TOTAL', color_continuous_scale='tealrose',
+                         hover_data={'ROW_COUNT': ':,', 'AVERAGE_PRICE': ':,.1f'},
+                         labels={'ROW_COUNT': '請求件数', 'AVERAGE_PRICE': '平均単価'})
             fig.update_layout(
                 title='支払手段別売上',
                 xaxis_title='支払手段',
@@ -98,46 +114,52 @@ def app():
         st.dataframe(filtered_data, hide_index=True)
 
         # エクスポートデータの準備と出力
-        export_data = sales_data.prepare_export_data(filtered_data)
-        
+        # （CSVは読み込みデータ・フィルター条件ごとに初回要求時のみ作成）
+        # （各テーブルは読み込み時に作成した集計キューブから再集計）
+        downloads = get_session_cache('sales_downloads')
+        filter_key = (sales_data.data_key, tuple(payment_methods), include_advance, include_non_sales)
+        filtered_cube = sales_data.filter_cube(payment_methods, include_advance, include_non_sales)
+
+        def export_artifact(name: str) -> DownloadArtifact:
+            return DownloadArtifact(
+                (*filter_key, name),
+                lambda: sales_data.prepare_export_item(filtered_cube, name),
+                downloads,
+                index=True
+            )
+
         st.sidebar.subheader(':material/download: データエクスポート')
         
         # ダウンロードボタンの配置
         col1, col2 = st.sidebar.columns(2)
-        col1.download_button(
+        export_artifact('preview').download_button(
             '詳細データ(preview)',
-            data=export_data['preview'].to_csv(encoding='cp932'),
             file_name='詳細データ.csv',
-            mime='text/csv'
+            container=col1
         )
         
-        col1.download_button(
+        export_artifact('sales').download_button(
             '売上票作成用データ',
-            data=export_data['sales'].to_csv(encoding='cp932'),
             file_name='売上作成用データ.csv',
-            mime='text/csv'
+            container=col1
         )
         
-        journal_data = export_data['journal']
-        col2.download_button(
+        export_artifact('sms').download_button(
             '仕訳用データ(SMS)',
-            data=journal_data['sms'].to_csv(encoding='cp932'),
             file_name='shiwake_sms.csv',
-            mime='text/csv'
+            container=col2
         )
         
-        col2.download_button(
+        export_artifact('shokki').download_button(
             '仕訳用データ(織機)',
-            data=journal_data['shokki'].to_csv(encoding='cp932'),
             file_name='shiwake_shokki.csv',
-            mime='text/csv'
+            container=col2
         )
         
-        col2.download_button(
+        export_artifact('ctc').download_button(
             '仕訳用データ(CTC)',
-            data=journal_data['ctc'].to_csv(encoding='cp932'),
             file_name='shiwake_ctc.csv',
-            mime='text/csv'
+            container=col2
         )
 
 if __name__ == "__main__":
@@ -1,7 +1,14 @@
 import pandas as pd
 import numpy as np
-from utils.config_loader import ConfigLoader
+from calculations import compute_totals
+from utils.code_remapper import CodeRemapper
+from utils.config_loader import get_config_loader
+from utils.csv_reader import CsvSchema
+from utils.memory_profile import StageProfiler
+from utils.numeric_coercion import coerce_numeric_columns
+from utils.rule_engine import compile_rules
 from typing import Dict, Any, List, Optional, Tuple
+from contextlib import nullcontext
 import streamlit as st
 import unicodedata
 
@@ -17,10 +24,14 @@ class SalaryDataProcessor:
             file: アップロードされたCSVファイル
         """
         try:
-            self.df = pd.read_csv(file, encoding='cp932')
-            self.config = ConfigLoader()
+            self.config = get_config_loader()
+            # 数値列・カテゴリ列は設定ファイルの型定義に従って読み込む
+            self.schema = CsvSchema.from_config(self.config, 'salary')
+            self.df = self.schema.read_csv(file, encoding='cp932')
             self.summary = None
+            self.numeric_report = None
             self.processed = False
+            self.results = (None, None)
         except Exception as e:
             st.error(f"初期化エラー: {str(e)}")
             raise
@@ -67,16 +78,11 @@ class SalaryDataProcessor:
         if not numeric_columns:
             return df
 
-        for col in numeric_columns:
-            if col in df.columns:
-                try:
-                    df[col] = pd.to_numeric(
-                        df[col].astype(str).replace(r'[^\d.-]', '', regex=True),
-                        errors='coerce'
-                    ).fillna(0)
-                except Exception as e:
-                    st.warning(f"カラム '{col}' の数値変換でエラーが発生しました")
-                    df[col] = 0
+        try:
+            # 全数値列をまとめて変換し、列ごとの補正・無効件数を保持
+            df, self.numeric_report = coerce_numeric_columns(df, numeric_columns)
+        except Exception as e:
+            st.warning(f"数値変換でエラーが発生しました: {str(e)}")
 
         return df
 
@@ -89,34 +95,40 @@ class SalaryDataProcessor:
             pd.DataFrame: 計算後のデータフレーム
         """
         try:
-            # 手当グループごとの合計を計算
+            # 手当グループごとの合計・支給総額・差引支給額・振込金額を定義順にまとめて計算
+            formulas = {}
             total_columns = self.config.get_settings('salary', 'calculations.total_columns')
             if total_columns:
                 for total_name, group_name in total_columns.items():
                     group_columns = self.config.get_settings('salary', f'input_columns.groups.{group_name}')
                     if group_columns:
-                        existing_columns = [col for col in group_columns if col in df.columns]
-                        if not existing_columns:
-                            st.warning(f"{total_name}の計算対象カラムが見つかりません: {group_columns}")
-                        else:
-                            if total_name in df.columns:
-                                df.drop(columns=[total_name], inplace=True)
-                            df[total_name] = df[existing_columns].fillna(0).sum(axis=1)
-                            # st.success(f"{total_name}の計算が完了しました")
-
-            # 支給総額の計算
-            payment_columns = ['基本給'] + [col for col in ['資格手当合計', '時間外勤務手当合計', 'その他手当合計', '通勤手当合計'] if col in df.columns]
-            if payment_columns:
-                df['支給総額'] = df[payment_columns].fillna(0).sum(axis=1)
-                # st.success("支給総額の計算が完了しました")
+                        formulas[total_name] = group_columns
+
+            # 支給総額は基本給と各手当の合計から計算
+            subtotals = ['資格手当合計', '時間外勤務手当合計', 'その他手当合計', '通勤手当合計']
+            computed = [name for name in formulas if name in subtotals]
+            payment_columns = ['基本給'] + [col for col in subtotals if col in computed or col in df.columns]
+            formulas['支給総額'] = payment_columns
 
             # 差引支給額と振込金額の計算
-            if '支給総額' in df.columns and '控除合計' in df.columns:
-                df['差引支給額'] = df['支給総額'] - df['控除合計']
-            if '振込金額' in df.columns:
-                df.drop(columns=['振込金額'], inplace=True)
-            df['振込金額'] = df['差引支給額'] - df['差引支給＿負']
-                # st.success("差引支給額と振込金額の計算が完了しました")
+            if '控除合計' in formulas or '控除合計' in df.columns:
+                formulas['差引支給額'] = {'支給総額': 1, '控除合計': -1}
+            formulas.pop('振込金額', None)
+            formulas['振込金額'] = {'差引支給額': 1, '差引支給＿負': -1}
+
+            totals, missing = compute_totals(df, formulas)
+            for total_name, missing_columns in missing.items():
+                if total_name in totals:
+                    st.warning(f"{total_name}の計算対象カラムの一部が見つかりません（合計から除外）: {missing_columns}")
+                else:
+                    st.warning(f"{total_name}の計算対象カラムが見つかりません: {formulas[total_name]}")
+
+            # 既存の合計列は削除して末尾に追加（差引支給額は元の位置のまま更新）
+            for total_name in totals:
+                if total_name in df.columns and total_name != '差引支給額':
+                    del df[total_name]
+            for total_name, values in totals.items():
+                df[total_name] = values
 
             return df
 
@@ -145,7 +157,8 @@ class SalaryDataProcessor:
                 }
 
                 if valid_rules:
-                    df = df.rename(columns=valid_rules)
+                    # 列名のみ変更（データはコピーしない）
+                    df.rename(columns=valid_rules, inplace=True)
 
                     for old_col, new_col in valid_rules.items():
                         if new_col not in df.columns:
@@ -213,7 +226,7 @@ class SalaryDataProcessor:
             }
             agg_dict = {k: v for k, v in agg_dict.items() if v is not None}
 
-            summary = df.groupby(existing_cols, as_index=False).agg(agg_dict)
+            summary = df.groupby(existing_cols, as_index=False, observed=True).agg(agg_dict)
             summary = summary.rename(columns={'コード': '支給人数'})
 
             # 一人当たり支給額の計算
@@ -253,53 +266,68 @@ class SalaryDataProcessor:
             st.error(f"集計処理でエラーが発生しました: {str(e)}")
             return None
 
-    def process_data(self) -> tuple:
+    def process_data(self, profiler: Optional[StageProfiler] = None) -> tuple:
         """
         データ処理の実行
+        （読み込んだデータは浅いコピーから処理し、変更した列のみ新しい配列になる。
+          処理済みの場合は前回の結果を返す）
+        Args:
+            profiler: 段階ごとの時間・メモリを記録する場合に指定
         Returns:
             tuple: (全項目用データフレーム, サマリー用データフレーム)
         """
+        if self.processed and profiler is None:
+            return self.results
+
+        stage = profiler.stage if profiler is not None else (lambda name: nullcontext())
         try:
             if not self._validate_columns():
                 return None, None
 
             # st.info("データ処理を開始します")
-            processed_df = self.df.copy()
+            # 列の追加・置き換えのみ行うため、データ本体はコピーしない
+            processed_df = self.df.copy(deep=False)
             
             # 1. 数値変換
-            processed_df = self._convert_numeric_columns(processed_df)
+            with stage('数値変換'):
+                processed_df = self._convert_numeric_columns(processed_df)
             # processed_df[processed_df.columns != self.config.get_settings('salary', 'input.numeric_columns')] = processed_df[processed_df.columns != self.config.get_settings('salary', 'input.numeric_columns')].astype(str)
 
 
             # 2. 合計計算
-            processed_df = self._calculate_totals(processed_df)
+            with stage('合計計算'):
+                processed_df = self._calculate_totals(processed_df)
             #  デバッグ：合計計算後
             if any(processed_df.columns.duplicated()):
                 st.error(f"[合計計算後] 重複カラム: {processed_df.columns[processed_df.columns.duplicated()].tolist()}")
 
             # 3. 列変換
-            processed_df = self._transform_columns(processed_df)
+            with stage('列変換'):
+                processed_df = self._transform_columns(processed_df)
             # デバッグ：列変換後
             if any(processed_df.columns.duplicated()):
                 st.error(f"[列変換後] 重複カラム: {processed_df.columns[processed_df.columns.duplicated()].tolist()}")
 
-            # 4. カラム順序の変更
-            output_columns_detail = self.config.get_settings('salary', 'output_settings.detail.columns_order')
-            processed_df_detail = processed_df[output_columns_detail]
+            # 4. カラム順序の変更（Copy-on-Write有効時は列の選択でデータをコピーしない）
+            with stage('出力列の選択'):
+                output_columns_detail = self.config.get_settings('salary', 'output_settings.detail.columns_order')
+                processed_df_detail = processed_df[output_columns_detail]
+                output_columns_summary = self.config.get_settings('salary', 'output_settings.summary.columns_order')
+                processed_df_summary = processed_df[output_columns_summary]
             # デバッグ：カラム順序変更後
             if any(processed_df_detail.columns.duplicated()):
                 st.error(f"[カラム順序変更後] 重複カラム: {processed_df_detail.columns[processed_df_detail.columns.duplicated()].tolist()}")
-            output_columns_summary = self.config.get_settings('salary', 'output_settings.summary.columns_order')
-            processed_df_summary = processed_df[output_columns_summary]
 
             # 5. サマリーの計算
-            self.summary = self._calculate_summary(processed_df_summary)
+            with stage('サマリー集計'):
+                self.summary = self._calculate_summary(processed_df_summary)
             
             # 処理完了フラグを設定
             self.processed = True
+            self.results = (processed_df_detail, processed_df_summary)
 
             # st.success("全ての処理が完了しました")
-            return processed_df_detail, processed_df_summary
+            return self.results
 
         except Exception as e:
             st.error(f"データ処理エラー: {str(e)}")
@@ -330,35 +358,8 @@ class SalaryDataProcessor:
             rules_dict = self.config.get_settings('salary', 'transformations.conditional_rules')
             if not rules_dict:
                 return
-            for group, rules in rules_dict.items():
-                for rule in rules:
-                    conditions = rule.get('conditions', {})
-                    target = rule.get('target')
-                    value = rule.get('value')
-                    source = rule.get('source')
-                    if not target or not conditions:
-                        continue
-                    # 条件に一致する行を抽出
-                    mask = pd.Series([True] * len(df))
-                    for col, cond_val in conditions.items():
-                        if isinstance(cond_val, str) and cond_val.startswith('>'):
-                            try:
-                                num = float(cond_val[1:].strip())
-                                mask &= df[col].astype(float) > num
-                            except Exception:
-                                mask &= False
-                        elif isinstance(cond_val, str) and cond_val.startswith('<'):
-                            try:
-                                num = float(cond_val[1:].strip())
-                                mask &= df[col].astype(float) < num
-                            except Exception:
-                                mask &= False
-                        else:
-                            mask &= df[col] == cond_val
-                    if value is not None:
-                        df.loc[mask, target] = value
-                    elif source is not None and source in df.columns:
-                        df.loc[mask, target] = df.loc[mask, source]
+            # ルールはコンパイル済みの実行計画で一括適用（順次適用と同じ結果）
+            compile_rules(rules_dict).apply(df)
         except Exception as e:
             st.warning(f"条件付き変換でエラー: {str(e)}")
 
@@ -375,38 +376,13 @@ class SalaryDataProcessor:
                 return
 
 
-            # 部門コードの変換
-            if 'department_code' in mappings and  '部門コード' in df.columns:
-                dept_mapping = mappings['department_code']
-                df['部門コード'] = df['部門コード'].astype(int).map(
-                    lambda x: dept_mapping.get(str(x), str(x))
-                )
-
-            # 部署コードの変換
-            if 'section_code' in mappings and '部署コード' in df.columns:
-                section_mapping = mappings['section_code']
-                df['部署コード'] = df['部署コード'].astype(int).map(
-                    lambda x: section_mapping.get(str(x), str(x))
-                )
-
-            # 結果の確認
-            for mapping_type, code_map in mappings.items():
-                if mapping_type == 'department_code':
-                    target_col = '部門コード'
-                elif mapping_type == 'section_code':
-                    target_col = '部署コード'
-                else:
+            # コードごとの変換先を参照表で引き、変換できなかったコードも同時に取得
+            for mapping_type, target_col in (('department_code', '部門コード'), ('section_code', '部署コード')):
+                if mapping_type not in mappings or target_col not in df.columns:
                     continue
-
-                if target_col in df.columns:
-                    # 現在の値取得（NaN以外）
-                    current_codes = set(df[target_col].dropna().astype(str).unique())
-                    unmapped = current_codes - {str(k) for k in code_map.keys()}
-                    if unmapped:
-                        st.warning(f"{mapping_type}の変換に失敗したコード: {unmapped}")
-                    str_code_map = {str(k): v for k, v in code_map.items()}
-                    df[target_col] = df[target_col].astype(str).map(
-                        lambda x: str_code_map.get(x, x) if pd.notna(x) else x
-                    )
+                remapper = CodeRemapper.from_mapping(mappings[mapping_type])
+                df[target_col], unmapped = remapper.remap(df[target_col], as_string=True)
+                if unmapped:
+                    st.warning(f"{mapping_type}の変換に失敗したコード: {set(map(str, unmapped))}")
         except Exception as e:
             st.warning(f"コード変換でエラー: {str(e)}")
\ No newline at end of file
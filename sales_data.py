@@ -1,34 +1,175 @@
 # models/sales_data.py
+from dataclasses import dataclass
 from typing import Optional
+import numpy as np
 import pandas as pd
 import altair as alt
 from config.sales_payment_config import PaymentConfig
+from utils.data_cache import DataFrameCache, content_hash
+
+
+@dataclass(frozen=True)
+class SalesFilterIndex:
+    """filter_data・サマリー用の行インデックス（読み込み時に1回だけ作成）"""
+
+    payment_codes: np.ndarray  # 行ごとの支払方法のコード番号
+    payment_values: pd.Index  # コード番号に対応する支払方法（欠損値を含む）
+    is_advance: np.ndarray  # KAI_CYCLE <= 1 を満たさない行（年払等・不明）
+    is_non_sales: np.ndarray  # 売上対象外（HEAD_CD == "9999"）の行
+    customer_codes: np.ndarray  # 行ごとの顧客（INPUT_NO）のコード番号（欠損値は-1）
+    customer_count: int  # 顧客コード番号の数
+    amounts: np.ndarray  # 行ごとの請求額（欠損値は0）
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'SalesFilterIndex':
+        """
+        結合済みデータから作成
+        Args:
+            df: 結合済みの売上データ
+        Returns:
+            SalesFilterIndex: 絞り込みインデックス
+        """
+        # 欠損値も1つの支払方法として扱う（queryの in と同じ判定にするため）
+        codes, uniques = pd.factorize(df['MEI_NAME_V'], use_na_sentinel=False)
+        customer_codes, customers = pd.factorize(df['INPUT_NO'])
+        amounts = df['SEIKYU_TOTAL']
+        return cls(
+            payment_codes=codes,
+            payment_values=pd.Index(uniques),
+            is_advance=~(df['KAI_CYCLE'] <= 1).to_numpy(dtype=bool),
+            is_non_sales=(df['HEAD_CD'] == '9999').to_numpy(dtype=bool),
+            customer_codes=customer_codes,
+            customer_count=len(customers),
+            amounts=(amounts if pd.api.types.is_integer_dtype(amounts) else amounts.fillna(0)).to_numpy(),
+        )
+
+    def mask(self, payment_methods: list, include_advance: bool, include_non_sales: bool) -> np.ndarray:
+        """
+        条件に一致する行の判定（支払方法はコード番号の参照表で判定）
+        Args:
+            payment_methods: 対象の支払方法
+            include_advance: 年払請求を含むかどうか
+            include_non_sales: 売上対象外を含むかどうか
+        Returns:
+            np.ndarray: 条件に一致する行はTrue
+        """
+        selected = self.payment_values.isin(payment_methods)
+        mask = selected[self.payment_codes]
+        if not include_advance:
+            mask &= ~self.is_advance
+        if not include_non_sales:
+            mask &= ~self.is_non_sales
+        return mask
+
+    def summarize(self, mask: np.ndarray) -> dict:
+        """
+        対象行の請求額合計・顧客数と支払方法別の内訳を集計
+        （顧客数はコード番号の重複除去で求め、文字列の比較は行わない）
+        Args:
+            mask: 対象の行（maskの結果）
+        Returns:
+            dict: total_amount / customer_count / average_price / by_payment（支払方法別の内訳）
+        """
+        payments = self.payment_codes[mask]
+        customers = self.customer_codes[mask]
+        amounts = self.amounts[mask]
+        n_payments = len(self.payment_values)
+
+        totals = np.bincount(payments, weights=amounts, minlength=n_payments)
+        if self.amounts.dtype.kind in 'iu':
+            totals = totals.astype(np.int64)
+
+        # (支払方法, 顧客) の組を一意にし、支払方法別の顧客数を数える
+        known = customers >= 0
+        pairs = np.unique(payments[known].astype(np.int64) * self.customer_count + customers[known])
+        customer_counts = np.bincount(pairs // max(self.customer_count, 1), minlength=n_payments)
+        seen = np.zeros(self.customer_count, dtype=bool)
+        seen[pairs % max(self.customer_count, 1)] = True
+
+        total_amount = amounts.sum()
+        customer_count = int(seen.sum())
+        by_payment = pd.DataFrame({
+            'MEI_NAME_V': self.payment_values,
+            'SEIKYU_TOTAL': totals,
+            'CUSTOMER_COUNT': customer_counts,
+        })
+        by_payment = by_payment[(np.bincount(payments, minlength=n_payments) > 0) & by_payment['MEI_NAME_V'].notna()]
+        by_payment = by_payment.assign(
+            AVERAGE_PRICE=by_payment['SEIKYU_TOTAL'] / by_payment['CUSTOMER_COUNT'].where(by_payment['CUSTOMER_COUNT'] > 0)
+        ).sort_values('MEI_NAME_V').reset_index(drop=True)
+        return {
+            'total_amount': total_amount,
+            'customer_count': customer_count,
+            'average_price': total_amount / customer_count if customer_count else 0.0,
+            'by_payment': by_payment,
+        }
+
 
 class SalesData:
     """売上データの処理を担当するクラス"""
+
+    # CSV読み込みオプション（キャッシュキーにも含める）
+    READ_OPTIONS = {'encoding': 'cp932', 'dtype': {'HEAD_CD': str, 'SUB_CD': str}}
+
+    # 仕訳用データの種類 → (支払方法, 含む/除く)
+    JOURNAL_TYPES = {
+        'sms': (['織機給与天引き', 'CTC'], False),
+        'shokki': (['織機給与天引き'], True),
+        'ctc': (['CTC'], True),
+    }
+
+    # 集計キューブのキー（KAI_BUCKET: 0=月払(KAI_CYCLE<=1) / 1=年払等(>1) / 2=不明、IS_NON_SALES: 売上対象外）
+    CUBE_KEYS = ['MEI_NAME_V', 'HEAD_CD', 'SUB_CD', 'ACCOUNT_CD', 'ACCHEAD_NAME', 'KAI_BUCKET', 'IS_NON_SALES']
+    KAI_BUCKET_MONTHLY = 0
+    KAI_BUCKET_ADVANCE = 1
+    KAI_BUCKET_UNKNOWN = 2
     
-    def __init__(self):
+    def __init__(self, cache: Optional[DataFrameCache] = None):
         self.df: Optional[pd.DataFrame] = None
         self.config = PaymentConfig()
+        self.cache = cache
+        self.data_key: Optional[str] = None
+        self.cube: Optional[pd.DataFrame] = None
+        self.filter_index: Optional[SalesFilterIndex] = None
 
     def load_data(self, sms_file, shokki_file) -> bool:
         """SMSと織機給与天引きデータを読み込み、結合する"""
         try:
             if sms_file is not None and shokki_file is not None:
-                sms_df = self._read_csv_file(sms_file)
-                shokki_df = self._read_csv_file(shokki_file)
-                shokki_df = self._overwrite_shokki_payment(shokki_df)
-                self.df = self._concat_dataframes(sms_df, shokki_df)
+                if self.cache is None:
+                    self.df = self._load_merged(sms_file, shokki_file)
+                    self.cube = self.build_cube(self.df)
+                    self.filter_index = SalesFilterIndex.from_frame(self.df)
+                else:
+                    # 同一内容のファイルであれば結合済みデータ・集計キューブ・絞り込みインデックスを再利用
+                    self.data_key = content_hash(sms_file, shokki_file, **self.READ_OPTIONS)
+                    self.df = self.cache.get_or_compute(self.data_key,
+                                                        lambda: self._load_merged(sms_file, shokki_file))
+                    self.cube = self.cache.get_or_compute((self.data_key, 'cube'), lambda: self.build_cube(self.df))
+                    self.filter_index = self.cache.get_or_compute((self.data_key, 'filter_index'),
+                                                                  lambda: SalesFilterIndex.from_frame(self.df))
                 return True
             return False
         except Exception as e:
             print(f"データ読み込みエラー: {e}")
             return False
 
-    @staticmethod
-    def _read_csv_file(file) -> pd.DataFrame:
+    def _load_merged(self, sms_file, shokki_file) -> pd.DataFrame:
+        """2ファイルを読み込んで結合したデータフレームを作成"""
+        sms_df = self._read_csv_file(sms_file)
+        shokki_df = self._read_csv_file(shokki_file)
+        shokki_df = self._overwrite_shokki_payment(shokki_df)
+        return self._concat_dataframes(sms_df, shokki_df)
+
+    @property
+    def cache_stats(self) -> dict:
+        """読み込みキャッシュのヒット/ミス件数"""
+        return self.cache.stats if self.cache is not None else {}
+
+    @classmethod
+    def _read_csv_file(cls, file) -> pd.DataFrame:
         """CSVファイルを読み込む"""
-        return pd.read_csv(file, encoding='cp932', dtype={'HEAD_CD': str, 'SUB_CD': str})
+        return pd.read_csv(file, **cls.READ_OPTIONS)
 
     @staticmethod
     def _overwrite_shokki_payment(df: pd.DataFrame) -> pd.DataFrame:
@@ -44,66 +185,127 @@ class SalesData:
         return df
 
     def filter_data(self, payment_methods: list, include_advance: bool, include_non_sales: bool) -> pd.DataFrame:
-        """条件に基づいてデータをフィルタリング"""
-        df_filtered = self.df.query('MEI_NAME_V in @payment_methods')
-        
+        """条件に基づいてデータをフィルタリング（条件をまとめたマスクで1回だけ抽出）"""
+        if self.filter_index is None:
+            self.filter_index = SalesFilterIndex.from_frame(self.df)
+        mask = self.filter_index.mask(payment_methods, include_advance, include_non_sales)
+        return self.df.take(np.flatnonzero(mask))
+
+    @classmethod
+    def build_cube(cls, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        フィルター・エクスポートに必要なキーで集計したキューブを作成（読み込みごとに1回）
+        SEIKYU_TOTALは合計、ROW_COUNTは元データの行数
+        """
+        kai_bucket = np.select(
+            [df['KAI_CYCLE'] <= 1, df['KAI_CYCLE'] > 1],
+            [cls.KAI_BUCKET_MONTHLY, cls.KAI_BUCKET_ADVANCE],
+            default=cls.KAI_BUCKET_UNKNOWN
+        )
+        keys = df[cls.CUBE_KEYS[:5]].assign(
+            KAI_BUCKET=kai_bucket,
+            IS_NON_SALES=(df['HEAD_CD'] == '9999').to_numpy(),
+            SEIKYU_TOTAL=df['SEIKYU_TOTAL']
+        )
+        # 欠損値のキーも保持し、派生する集計側で元データと同様に除外する
+        return keys.groupby(cls.CUBE_KEYS, dropna=False, sort=False).agg(
+            SEIKYU_TOTAL=('SEIKYU_TOTAL', 'sum'),
+            ROW_COUNT=('SEIKYU_TOTAL', 'size')
+        ).reset_index()
+
+    def filter_cube(self, payment_methods: list, include_advance: bool, include_non_sales: bool) -> pd.DataFrame:
+        """filter_dataと同じ条件で集計キューブを絞り込む"""
+        cube = self.cube
+        mask = cube['MEI_NAME_V'].isin(payment_methods)
         if not include_advance:
-            df_filtered = df_filtered.query('KAI_CYCLE <= 1')
+            mask &= cube['KAI_BUCKET'] == self.KAI_BUCKET_MONTHLY
         if not include_non_sales:
-            df_filtered = df_filtered.query('HEAD_CD != "9999"')
-            
-        return df_filtered
+            mask &= ~cube['IS_NON_SALES']
+        return cube[mask]
 
     def calculate_summary(self, df: pd.DataFrame) -> dict:
         """サマリー情報を計算"""
+        total_amount = df['SEIKYU_TOTAL'].sum()
+        customer_count = df['INPUT_NO'].nunique()
         return {
-            'total_amount': df['SEIKYU_TOTAL'].sum(),
-            'customer_count': df['INPUT_NO'].nunique(),
-            'average_price': df['SEIKYU_TOTAL'].sum() / df['INPUT_NO'].nunique()
+            'total_amount': total_amount,
+            'customer_count': customer_count,
+            'average_price': total_amount / customer_count
         }
 
-    def create_payment_chart_data(self, df: pd.DataFrame) -> 'pd.DataFrame':
-        """支払方法別の棒グラフを作成"""
-        # grouped_data = pd.pivot_table(
-        #     df, 
-        #     index=['MEI_NAME_V'],
-        #     values='SEIKYU_TOTAL',
-        #     aggfunc='sum'
-        # ).reset_index()
+    def summarize(self, payment_methods: list, include_advance: bool, include_non_sales: bool) -> dict:
+        """
+        フィルター条件ごとのサマリー情報（支払方法別の内訳を含む）
+        読み込み時のインデックスから1回の走査で集計し、キャッシュがある場合は条件ごとに再利用
+        """
+        def compute() -> dict:
+            if self.filter_index is None:
+                self.filter_index = SalesFilterIndex.from_frame(self.df)
+            index = self.filter_index
+            return index.summarize(index.mask(payment_methods, include_advance, include_non_sales))
 
-        grouped_data = df.groupby('')
+        if self.cache is None or self.data_key is None:
+            return compute()
+        key = (self.data_key, 'summary', tuple(payment_methods), include_advance, include_non_sales)
+        return self.cache.get_or_compute(key, compute)
 
+    def create_payment_chart_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        支払方法別の集計（請求額合計・件数・平均単価）を作成
+        dfはfilter_cubeで絞り込んだ集計キューブ（支払方法の数だけの行を返す）
+        """
+        chart_data = df.groupby('MEI_NAME_V', observed=True).agg(
+            SEIKYU_TOTAL=('SEIKYU_TOTAL', 'sum'),
+            ROW_COUNT=('ROW_COUNT', 'sum')
+        ).reset_index()
+        chart_data['AVERAGE_PRICE'] = chart_data['SEIKYU_TOTAL'] / chart_data['ROW_COUNT']
+        return chart_data
+
+    def payment_chart_data(self, payment_methods: list, include_advance: bool, include_non_sales: bool) -> pd.DataFrame:
+        """フィルター条件ごとの支払方法別グラフデータ（キャッシュがある場合は条件ごとに再利用）"""
+        def compute() -> pd.DataFrame:
+            return self.create_payment_chart_data(
+                self.filter_cube(payment_methods, include_advance, include_non_sales))
 
-        return grouped_data
-        # return alt.Chart(grouped_data).mark_bar().encode(
-        #     y=alt.Y('SEIKYU_TOTAL', title='金額'),
-        #     x=alt.X('MEI_NAME_V', title='支払方法'),
-        #     tooltip=['SEIKYU_TOTAL']
-        # ).interactive().properties(height=600, title='支払手段別請求額')
+        if self.cache is None or self.data_key is None:
+            return compute()
+        key = (self.data_key, 'chart', tuple(payment_methods), include_advance, include_non_sales)
+        return self.cache.get_or_compute(key, compute)
 
     def prepare_export_data(self, df: pd.DataFrame) -> dict:
-        """エクスポート用のデータを準備"""
+        """エクスポート用のデータを準備（dfはfilter_cubeで絞り込んだ集計キューブ）"""
         return {
             'preview': self._prepare_preview_data(df),
             'sales': self._prepare_sales_data(df),
             'journal': self._prepare_journal_data(df)
         }
 
+    def prepare_export_item(self, df: pd.DataFrame, name: str) -> pd.DataFrame:
+        """
+        エクスポート用データを1種類だけ準備（'preview' / 'sales' / JOURNAL_TYPESのキー）
+        dfはfilter_cubeで絞り込んだ集計キューブ（小計を再集計するため元データは走査しない）
+        """
+        if name == 'preview':
+            return self._prepare_preview_data(df)
+        if name == 'sales':
+            return self._prepare_sales_data(df)
+        payment_type, include = self.JOURNAL_TYPES[name]
+        return self._prepare_journal_by_type(df, payment_type, include)
+
     def _prepare_preview_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """プレビューデータの準備"""
         return self.calc_aggregation(df)
 
     def _prepare_sales_data(self, df: pd.DataFrame) -> pd.DataFrame:
         """売上データの準備"""
-        advance_df = df.query('HEAD_CD != "9999" and KAI_CYCLE > 1')
+        advance_df = df[~df['IS_NON_SALES'] & (df['KAI_BUCKET'] == self.KAI_BUCKET_ADVANCE)]
         return self.calc_aggregation(advance_df)
 
     def _prepare_journal_data(self, df: pd.DataFrame) -> dict:
         """仕訳データの準備"""
         return {
-            'sms': self._prepare_journal_by_type(df, '織機給与天引き", "CTC', False),
-            'shokki': self._prepare_journal_by_type(df, '織機給与天引き', True),
-            'ctc': self._prepare_journal_by_type(df, 'CTC', True)
+            name: self._prepare_journal_by_type(df, payment_type, include)
+            for name, (payment_type, include) in self.JOURNAL_TYPES.items()
         }
 
     @staticmethod
@@ -116,10 +318,11 @@ class SalesData:
             aggfunc='sum'
         ).reset_index()
 
-    def _prepare_journal_by_type(self, df: pd.DataFrame, payment_type: str, include: bool) -> pd.DataFrame:
+    def _prepare_journal_by_type(self, df: pd.DataFrame, payment_type: list, include: bool) -> pd.DataFrame:
         """支払タイプ別の仕訳データ準備"""
-        query = f'MEI_NAME_V {"in" if include else "not in"} ["{payment_type}"]'
-        filtered_df = df.query(query).filter(['HEAD_CD', 'SUB_CD', 'ACCOUNT_CD', 'ACCHEAD_NAME', 'SEIKYU_TOTAL'])
+        matched = df['MEI_NAME_V'].isin(payment_type)
+        filtered_df = df[matched if include else ~matched].filter(
+            ['HEAD_CD', 'SUB_CD', 'ACCOUNT_CD', 'ACCHEAD_NAME', 'SEIKYU_TOTAL'])
         return self.calc_aggregation_add_acchead(filtered_df)
 
     @staticmethod
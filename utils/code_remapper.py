@@ -0,0 +1,106 @@
+from dataclasses import dataclass
+from typing import Any, List, Mapping, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 参照表（コード → 変換先の位置）を配列で持つコードの範囲の上限
+DENSE_SPAN_LIMIT = 1 << 16
+
+# 参照表で「変換対象外」を表す位置
+NOT_MAPPED = -1
+
+
+@dataclass(frozen=True)
+class CodeRemapper:
+    """整数コードの変換表（コードの範囲が狭い場合は配列の参照表、広い場合は二分探索で変換先を引く）"""
+
+    keys: np.ndarray  # 変換元のコード（昇順）
+    values: np.ndarray  # keysと同じ順の変換先
+    dense: Optional[np.ndarray] = None  # keys[0]を起点とした参照表（変換先の位置、対象外は-1）
+
+    @classmethod
+    def from_mapping(cls, mapping: Mapping[Any, Any]) -> 'CodeRemapper':
+        """
+        辞書から変換表を作成
+        Args:
+            mapping: 変換元コード → 変換先の辞書（キーは整数または整数の文字列）
+        Returns:
+            CodeRemapper: 変換表
+        Raises:
+            ValueError: キーを整数に変換できない場合
+        """
+        keys = np.array([int(key) for key in mapping], dtype=np.int64)
+        values = np.asarray(list(mapping.values()))
+        if values.dtype.kind not in 'iufb':
+            values = np.asarray(list(mapping.values()), dtype=object)
+        order = np.argsort(keys, kind='stable')
+        keys, values = keys[order], values[order]
+        if len(keys) and len(np.unique(keys)) != len(keys):
+            raise ValueError('変換元のコードが重複しています')
+
+        dense = None
+        if len(keys) and keys[-1] - keys[0] < DENSE_SPAN_LIMIT:
+            dense = np.full(int(keys[-1] - keys[0]) + 1, NOT_MAPPED, dtype=np.int64)
+            dense[keys - keys[0]] = np.arange(len(keys))
+        return cls(keys, values, dense)
+
+    def positions(self, codes: np.ndarray) -> np.ndarray:
+        """
+        コードごとの変換先の位置を取得
+        Args:
+            codes: 整数コード
+        Returns:
+            np.ndarray: valuesの位置（変換対象外は-1）
+        """
+        result = np.full(len(codes), NOT_MAPPED, dtype=np.int64)
+        if not len(self.keys):
+            return result
+        if self.dense is not None:
+            offset = codes - self.keys[0]
+            in_range = (offset >= 0) & (offset < len(self.dense))
+            result[in_range] = self.dense[offset[in_range]]
+        else:
+            found = np.minimum(np.searchsorted(self.keys, codes), len(self.keys) - 1)
+            hit = self.keys[found] == codes
+            result[hit] = found[hit]
+        return result
+
+    def remap(self, series: pd.Series, as_string: bool = False) -> Tuple[pd.Series, List[Any]]:
+        """
+        列のコードを一括で変換し、変換対象外のコードも同時に取得
+        Args:
+            series: 変換する列（整数コード、欠損値・整数以外の値は変換しない）
+            as_string: Trueの場合は変換対象外のコードも文字列（str(int(コード))）にする
+        Returns:
+            Tuple[pd.Series, List[Any]]: (変換後の列, 変換対象外のコード（昇順、欠損値を除く）)
+        """
+        values = series.to_numpy()
+        if values.dtype.kind in 'iu':
+            valid = np.ones(len(values), dtype=bool)
+            codes = values.astype(np.int64, copy=False)
+        else:
+            numeric = pd.to_numeric(series, errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+            valid = np.isfinite(numeric) & (numeric == np.trunc(numeric))
+            codes = np.where(valid, numeric, 0).astype(np.int64)
+
+        positions = self.positions(codes)
+        mapped = valid & (positions != NOT_MAPPED)
+        missing = valid & ~mapped
+        unmapped_codes, inverse = np.unique(codes[missing], return_inverse=True)
+
+        if as_string:
+            result = values.astype(object, copy=True)
+            result[missing] = np.array([str(code) for code in unmapped_codes], dtype=object)[inverse]
+        elif values.dtype.kind in 'iufb' and self.values.dtype.kind in 'iufb':
+            # 変換先が元の型で表せる場合は元の型のまま（Series.replaceと同じ）
+            with np.errstate(invalid='ignore', over='ignore'):
+                fits = np.array_equal(self.values.astype(values.dtype), self.values)
+            dtype = values.dtype if fits else np.result_type(values.dtype, self.values.dtype)
+            result = values.astype(dtype, copy=True)
+        else:
+            result = values.astype(object, copy=True)
+        result[mapped] = self.values[positions[mapped]]
+
+        return pd.Series(result, index=series.index, name=series.name), unmapped_codes.tolist()
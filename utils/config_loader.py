@@ -2,19 +2,32 @@ import yaml
 from pathlib import Path
 from typing import Dict, Any, List, Union, Optional
 import os
+import threading
 import streamlit as st
 
+try:
+    # libyamlが利用可能であればC実装のローダーを使用
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeLoader as YamlLoader
+
+
+DEFAULT_CONFIG_PATH = "config/data_processing_rules.yaml"
+
 
 class ConfigLoader:
     """設定ファイルローダークラス"""
 
-    def __init__(self, config_path: str = "config/data_processing_rules.yaml"):
+    def __init__(self, config_path: str = DEFAULT_CONFIG_PATH):
         """
         設定ファイルローダーの初期化
         Args:
             config_path: 設定ファイルのパス
         """
         self.config_path = Path(config_path)
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._index: Dict[str, Any] = {}
         self._load_config()
 
     def _load_config(self) -> None:
@@ -23,13 +36,57 @@ class ConfigLoader:
             if not os.path.exists(self.config_path):
                 raise FileNotFoundError(f"設定ファイルが見つかりません: {self.config_path}")
 
+            mtime = os.stat(self.config_path).st_mtime_ns
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                self.config = yaml.safe_load(f)
+                self.config = yaml.load(f, Loader=YamlLoader)
+
+            self._index = self._build_index(self.config)
+            self._mtime = mtime
 
         except Exception as e:
             st.error(f"設定ファイルの読み込みエラー: {str(e)}")
             raise
 
+    @staticmethod
+    def _build_index(config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        ドット区切りのキーで直接引ける索引を作成
+        Args:
+            config: 読み込んだ設定
+        Returns:
+            Dict[str, Any]: "セクション.キー.サブキー" → 設定値
+        """
+        index = {}
+        stack = [(str(k), v) for k, v in (config or {}).items()]
+        while stack:
+            path, value = stack.pop()
+            index[path] = value
+            if isinstance(value, dict):
+                # get_settingsと同様に文字列キーのみ辿る
+                stack.extend((f"{path}.{k}", v) for k, v in value.items() if isinstance(k, str))
+        return index
+
+    @property
+    def version(self) -> Optional[int]:
+        """読み込んだ設定ファイルの更新日時（再読み込みで変わる）"""
+        return self._mtime
+
+    def reload_if_modified(self) -> bool:
+        """
+        設定ファイルが更新されていれば再読み込みする
+        Returns:
+            bool: 再読み込みした場合はTrue
+        """
+        with self._lock:
+            try:
+                mtime = os.stat(self.config_path).st_mtime_ns
+            except OSError:
+                return False
+            if mtime == self._mtime:
+                return False
+            self._load_config()
+            return True
+
     def get_settings(self, section: str, key: str) -> Any:
         """
         指定されたセクションの設定値を取得
@@ -40,7 +97,11 @@ class ConfigLoader:
             Any: 設定値
         """
         try:
-            # セクションの取得
+            value = self._index.get(f"{section}.{key}", _MISSING)
+            if value is not _MISSING:
+                return value
+
+            # 索引にない場合は従来通り原因を特定して警告
             if section not in self.config:
                 st.warning(f"セクションが見つかりません: {section}")
                 return None
@@ -185,4 +246,28 @@ class ConfigLoader:
 
     # def get_replace_rules(self, data_type: str) -> Dict[str, Dict[int, int]]:
     #     """コード変換ルールを取得します。"""
-    #     return self.get_rules(data_type)['replace_rules'] 
\ No newline at end of file
+    #     return self.get_rules(data_type)['replace_rules'] 
+
+
+_MISSING = object()
+_LOADERS: Dict[Path, ConfigLoader] = {}
+_LOADERS_LOCK = threading.Lock()
+
+
+def get_config_loader(config_path: str = DEFAULT_CONFIG_PATH) -> ConfigLoader:
+    """
+    プロセス内で共有する設定ファイルローダーを取得
+    （ファイルの更新日時が変わった場合のみ再読み込み）
+    Args:
+        config_path: 設定ファイルのパス
+    Returns:
+        ConfigLoader: 共有のローダー
+    """
+    key = Path(config_path).resolve()
+    with _LOADERS_LOCK:
+        loader = _LOADERS.get(key)
+        if loader is None:
+            loader = _LOADERS[key] = ConfigLoader(config_path)
+            return loader
+    loader.reload_if_modified()
+    return loader
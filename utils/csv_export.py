@@ -0,0 +1,44 @@
+import io
+from typing import Optional
+
+import pandas as pd
+
+
+# 出力ファイルの文字コード（会計システム取込用）
+DEFAULT_ENCODING = 'cp932'
+
+
+def write_csv(df: pd.DataFrame, buffer: Optional[io.BufferedIOBase] = None, index: bool = False,
+              encoding: str = DEFAULT_ENCODING, **kwargs) -> io.BufferedIOBase:
+    """
+    DataFrameをエンコード済みのCSVとしてバッファに書き込む
+    （pandasが行ブロック単位でエンコードしながら書き込むため、出力全体の文字列は作成しない）
+    Args:
+        df: 出力するデータフレーム
+        buffer: 書き込み先のバイナリバッファ（省略時はBytesIOを作成）
+        index: インデックスを含めるかどうか
+        encoding: 文字コード
+        **kwargs: DataFrame.to_csvに渡すその他の引数
+    Returns:
+        io.BufferedIOBase: 書き込み済みのバッファ
+    """
+    if buffer is None:
+        buffer = io.BytesIO()
+    df.to_csv(buffer, index=index, encoding=encoding, **kwargs)
+    return buffer
+
+
+def to_csv_bytes(df: pd.DataFrame, index: bool = False, encoding: str = DEFAULT_ENCODING, **kwargs) -> bytes:
+    """
+    DataFrameをCSV形式のバイトデータに変換
+    （df.to_csv().encode(encoding) と同一の内容）
+    Args:
+        df: 出力するデータフレーム
+        index: インデックスを含めるかどうか
+        encoding: 文字コード
+        **kwargs: DataFrame.to_csvに渡すその他の引数
+    Returns:
+        bytes: CSV形式のバイトデータ
+    """
+    return write_csv(df, index=index, encoding=encoding, **kwargs).getvalue()
+
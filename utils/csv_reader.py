@@ -0,0 +1,167 @@
+import codecs
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+
+
+# 判定候補の文字コード（cp932はshift-jisの上位互換のため先に試す）
+DEFAULT_ENCODINGS = ('utf-8', 'cp932', 'shift-jis')
+
+# 判定に使う先頭サンプルのサイズ
+DEFAULT_SAMPLE_SIZE = 64 * 1024
+
+_BLOCK_SIZE = 1024 * 1024
+
+
+def _decodes(file, encoding: str, sample: bytes, sample_size: int, validate: bool) -> bool:
+    """
+    指定の文字コードでデコードできるか確認
+    Args:
+        file: ファイルオブジェクト（サンプル読み込み直後の位置）
+        encoding: 確認する文字コード
+        sample: 先頭サンプル
+        sample_size: サンプルの最大サイズ
+        validate: Trueの場合はファイル全体をデコードして確認
+    Returns:
+        bool: デコードできる場合はTrue
+    """
+    decoder = codecs.getincrementaldecoder(encoding)()
+    is_whole_file = len(sample) < sample_size
+    try:
+        # サンプル末尾のマルチバイト文字の途中切れはエラーにしない
+        decoder.decode(sample, final=is_whole_file)
+        if validate and not is_whole_file:
+            file.seek(len(sample))
+            while True:
+                block = file.read(_BLOCK_SIZE)
+                decoder.decode(block, final=not block)
+                if not block:
+                    break
+    except UnicodeDecodeError:
+        return False
+    return True
+
+
+def detect_encoding(file, candidates: Iterable[str] = DEFAULT_ENCODINGS,
+                    sample_size: int = DEFAULT_SAMPLE_SIZE, validate: bool = False) -> Tuple[str, float]:
+    """
+    ファイル先頭のサンプルから文字コードを判定
+    Args:
+        file: バイナリモードのファイルオブジェクト
+        candidates: 判定候補の文字コード（優先順）
+        sample_size: 判定に使う先頭サンプルのサイズ（バイト）
+        validate: Trueの場合はファイル全体をデコードして確認
+    Returns:
+        Tuple[str, float]: (文字コード, 判定にかかった秒数)
+    Raises:
+        ValueError: いずれの文字コードでもデコードできない場合
+    """
+    start = time.perf_counter()
+    file.seek(0)
+    sample = file.read(sample_size)
+    try:
+        if sample.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig', time.perf_counter() - start
+
+        for encoding in candidates:
+            if _decodes(file, encoding, sample, sample_size, validate):
+                return encoding, time.perf_counter() - start
+
+        raise ValueError(f"文字コードを判定できません（候補: {', '.join(candidates)}）")
+    finally:
+        file.seek(0)
+
+
+def format_detection(encoding: str, elapsed: Optional[float]) -> str:
+    """
+    文字コード判定結果の表示用文字列を作成
+    Args:
+        encoding: 文字コード
+        elapsed: 判定にかかった秒数（指定時はNone）
+    Returns:
+        str: 表示用文字列
+    """
+    if elapsed is None:
+        return f"文字コード: {encoding}（指定）"
+    return f"文字コード: {encoding}（判定時間: {elapsed * 1000:.1f}ms）"
+
+
+@dataclass(frozen=True)
+class CsvSchema:
+    """CSV読み込み時の列の型定義"""
+
+    numeric_columns: Tuple[str, ...] = ()  # 数値として読み込む列（int64/float64）
+    category_columns: Tuple[str, ...] = ()  # カテゴリ型で読み込む列（コード名称など）
+    default_dtype: Optional[type] = None  # その他の列の型（Noneの場合は自動判定）
+    text_na_value: Optional[str] = None  # 文字列・カテゴリ列の欠損値の置換値（Noneの場合は置換しない）
+
+    @classmethod
+    def from_config(cls, config, section: str, default_dtype: Optional[type] = None,
+                    text_na_value: Optional[str] = None) -> 'CsvSchema':
+        """
+        設定ファイルの input.numeric_columns / input.category_columns から作成
+        Args:
+            config: ConfigLoader
+            section: 設定セクション名（'salary' / 'bonus'）
+            default_dtype: その他の列の型
+            text_na_value: 文字列・カテゴリ列の欠損値の置換値
+        Returns:
+            CsvSchema: 列の型定義
+        """
+        numeric_columns = config.get_settings(section, 'input.numeric_columns') or []
+        category_columns = config.get_settings(section, 'input.category_columns') or []
+        return cls(tuple(numeric_columns), tuple(category_columns), default_dtype, text_na_value)
+
+    def dtypes(self, columns: Iterable[str]) -> Dict[str, Any]:
+        """
+        読み込み対象の列に対するdtype指定を作成
+        Args:
+            columns: CSVのヘッダー
+        Returns:
+            Dict[str, Any]: read_csvのdtype引数
+        """
+        numeric = set(self.numeric_columns)
+        category = set(self.category_columns)
+        dtypes = {}
+        for col in columns:
+            if col in category:
+                dtypes[col] = 'category'
+            elif col in numeric:
+                # 数値列はパーサーの型判定に任せる（変換できない値を含む場合はobjectのまま）
+                continue
+            elif self.default_dtype is not None:
+                dtypes[col] = self.default_dtype
+        return dtypes
+
+    def read_csv(self, file, encoding: str) -> pd.DataFrame:
+        """
+        型定義に従ってCSVを読み込む
+        Args:
+            file: バイナリモードのファイルオブジェクト
+            encoding: 文字コード
+        Returns:
+            pd.DataFrame: 読み込んだデータフレーム
+        """
+        file.seek(0)
+        header = pd.read_csv(file, encoding=encoding, nrows=0).columns
+        file.seek(0)
+        df = pd.read_csv(file, encoding=encoding, dtype=self.dtypes(header))
+        if self.text_na_value is None:
+            return df
+
+        # 欠損値は文字列列・カテゴリ列のみ置き換える（数値列はNaNのまま）
+        fill = self.text_na_value
+        for col in df.columns:
+            series = df[col]
+            if not series.hasnans:
+                continue
+            if isinstance(series.dtype, pd.CategoricalDtype):
+                if fill not in series.cat.categories:
+                    # 並び順（集計時のソート順）は文字列の昇順を保つ
+                    series = series.cat.set_categories(sorted([*series.cat.categories, fill]))
+                df[col] = series.fillna(fill)
+            elif series.dtype == object:
+                df[col] = series.fillna(fill)
+        return df
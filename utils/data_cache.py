@@ -0,0 +1,193 @@
+import dataclasses
+import hashlib
+import sys
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+
+def _read_bytes(file) -> bytes:
+    """
+    アップロードファイル・ファイルパス・ファイルオブジェクトから内容をバイト列で取得
+    Args:
+        file: アップロードされたファイルまたはファイルパス
+    Returns:
+        bytes: ファイルの内容
+    """
+    if file is None:
+        return b''
+    if isinstance(file, (str, Path)):
+        return Path(file).read_bytes()
+    if hasattr(file, 'getvalue'):
+        return file.getvalue()
+
+    # 読み込み位置を保持したまま全体を読む
+    position = file.tell()
+    file.seek(0)
+    data = file.read()
+    file.seek(position)
+    return data
+
+
+def content_hash(*files, **options) -> str:
+    """
+    ファイル内容と読み込みオプションからキャッシュキーを生成
+    Args:
+        *files: ハッシュ対象のファイル（順序も区別する）
+        **options: 読み込みオプション（異なる場合は別キーになる）
+    Returns:
+        str: キャッシュキー
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for file in files:
+        data = _read_bytes(file)
+        # 連結による衝突を避けるため長さも含める
+        digest.update(len(data).to_bytes(8, 'little'))
+        digest.update(data)
+    digest.update(repr(sorted(options.items())).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def estimate_size(value: Any) -> int:
+    """
+    キャッシュ対象オブジェクトのおおよそのメモリ使用量を取得
+    Args:
+        value: キャッシュ対象の値
+    Returns:
+        int: バイト数
+    """
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(estimate_size(v) for v in value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return sum(estimate_size(getattr(value, field.name)) for field in dataclasses.fields(value))
+    return sys.getsizeof(value)
+
+
+class DataFrameCache:
+    """ファイル内容のハッシュをキーとするLRUキャッシュ"""
+
+    def __init__(self, max_entries: int = 8, max_bytes: int = 512 * 1024 ** 2):
+        """
+        キャッシュの初期化
+        Args:
+            max_entries: 保持する最大件数
+            max_bytes: 保持する合計サイズの上限（バイト）
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._sizes: Dict[Hashable, int] = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        キャッシュから値を取得（ヒット/ミスを記録）
+        Args:
+            key: キャッシュキー
+        Returns:
+            Optional[Any]: キャッシュ済みの値（存在しない場合はNone）
+        """
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """
+        キャッシュに値を登録し、上限を超えた分を古い順に破棄
+        Args:
+            key: キャッシュキー
+            value: 登録する値
+        """
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            # 単体で上限を超えるものはキャッシュしない
+            return
+
+        self.discard(key)
+        self._entries[key] = value
+        self._sizes[key] = size
+        self.total_bytes += size
+
+        while self._entries and (len(self._entries) > self.max_entries or self.total_bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self.discard(oldest)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """
+        キャッシュにあれば返し、なければ計算して登録する
+        Args:
+            key: キャッシュキー
+            compute: 値を計算する関数（引数なし）
+        Returns:
+            Any: キャッシュ済みまたは計算した値
+        """
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.put(key, value)
+        return value
+
+    def discard(self, key: Hashable) -> None:
+        """指定したキーをキャッシュから削除"""
+        if key in self._entries:
+            del self._entries[key]
+            self.total_bytes -= self._sizes.pop(key)
+
+    def clear(self) -> None:
+        """キャッシュを全て削除（ヒット/ミス件数は保持）"""
+        self._entries.clear()
+        self._sizes.clear()
+        self.total_bytes = 0
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        """キャッシュの統計情報"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': len(self._entries),
+            'bytes': self.total_bytes,
+        }
+
+
+def get_session_cache(name: str, **kwargs) -> DataFrameCache:
+    """
+    セッション単位で共有するキャッシュを取得（初回のみ生成）
+    Args:
+        name: キャッシュ名
+        **kwargs: DataFrameCacheの初期化引数
+    Returns:
+        DataFrameCache: セッションのキャッシュ
+    """
+    key = f'_data_cache_{name}'
+    if key not in st.session_state:
+        st.session_state[key] = DataFrameCache(**kwargs)
+    return st.session_state[key]
@@ -0,0 +1,67 @@
+from typing import Callable, Hashable, Optional
+
+import pandas as pd
+import streamlit as st
+
+from utils.csv_export import DEFAULT_ENCODING, to_csv_bytes
+from utils.data_cache import DataFrameCache
+
+try:
+    from streamlit.elements.widgets.button import DownloadButtonDataType
+    # クリック時にデータを生成する関数を渡せるバージョンかどうか
+    SUPPORTS_CALLABLE_DATA = 'Callable' in str(DownloadButtonDataType)
+except ImportError:
+    SUPPORTS_CALLABLE_DATA = False
+
+
+class DownloadArtifact:
+    """ダウンロード用CSVの遅延生成（初回要求時にのみ作成し、キーごとに再利用）"""
+
+    def __init__(self, key: Hashable, build: Callable[[], pd.DataFrame], cache: Optional[DataFrameCache] = None,
+                 index: bool = False, encoding: str = DEFAULT_ENCODING):
+        """
+        ダウンロードデータの初期化
+        Args:
+            key: キャッシュキー（入力ファイルのハッシュ・フィルター条件・データ名を含める）
+            build: 出力するデータフレームを作成する関数（引数なし）
+            cache: 作成済みのCSVを保持するキャッシュ（Noneの場合は保持しない）
+            index: インデックスを含めるかどうか
+            encoding: 文字コード
+        """
+        self.key = key
+        self.build = build
+        self.cache = cache
+        self.index = index
+        self.encoding = encoding
+
+    def _encode(self) -> bytes:
+        return to_csv_bytes(self.build(), index=self.index, encoding=self.encoding)
+
+    def getvalue(self) -> bytes:
+        """
+        CSV形式のバイトデータを取得（キャッシュ済みの場合は再作成しない）
+        Returns:
+            bytes: CSV形式のバイトデータ
+        """
+        if self.cache is None:
+            return self._encode()
+        return self.cache.get_or_compute(self.key, self._encode)
+
+    def __call__(self) -> bytes:
+        return self.getvalue()
+
+    def download_button(self, label: str, file_name: str, container=st, mime: str = 'text/csv', **kwargs):
+        """
+        ダウンロードボタンを表示
+        （対応バージョンではクリック時にCSVを作成し、それ以外は表示時に作成する）
+        Args:
+            label: ボタンのラベル
+            file_name: ダウンロードファイル名
+            container: ボタンを配置するコンテナ（st.sidebar、列など）
+            mime: MIMEタイプ
+            **kwargs: download_buttonに渡すその他の引数
+        Returns:
+            bool: ボタンがクリックされたかどうか
+        """
+        data = self.getvalue if SUPPORTS_CALLABLE_DATA else self.getvalue()
+        return container.download_button(label, data=data, file_name=file_name, mime=mime, **kwargs)
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+from typing import FrozenSet, Hashable, Iterable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class ExclusionFilter:
+    """コードの一覧に一致する行を除外するフィルター（除外内訳も同時に集計）"""
+
+    column: str  # 判定するカラム
+    codes: FrozenSet[Hashable]  # 除外するコード
+    amount_column: Optional[str] = None  # 除外内訳で合計する金額カラム
+
+    @classmethod
+    def of(cls, column: str, codes: Iterable[Hashable], amount_column: Optional[str] = None) -> 'ExclusionFilter':
+        """
+        コードの一覧から作成
+        Args:
+            column: 判定するカラム
+            codes: 除外するコード（カラムの値と同じ型で指定）
+            amount_column: 除外内訳で合計する金額カラム
+        Returns:
+            ExclusionFilter: フィルター
+        """
+        return cls(column, frozenset(codes), amount_column)
+
+    def _match(self, df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, pd.Index]:
+        """
+        一意な値ごとに除外対象かを判定し、行単位の結果に展開
+        Returns:
+            Tuple[np.ndarray, np.ndarray, pd.Index]: (行ごとの除外フラグ, 行ごとのコード番号, 一意な値)
+        """
+        codes, uniques = pd.factorize(df[self.column], use_na_sentinel=True)
+        # 欠損値（コード番号-1）は末尾のFalseを参照させる
+        hit = np.fromiter((value in self.codes for value in uniques), dtype=bool, count=len(uniques))
+        return np.append(hit, False)[codes], codes, pd.Index(uniques)
+
+    def mask(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        除外対象の行を判定
+        Args:
+            df: 判定するデータフレーム
+        Returns:
+            np.ndarray: 除外対象の行はTrue
+        """
+        return self._match(df)[0]
+
+    def apply(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        除外対象の行を取り除き、コードごとの除外内訳を作成
+        Args:
+            df: 対象のデータフレーム
+        Returns:
+            Tuple[pd.DataFrame, pd.DataFrame]: (除外後のデータフレーム, 除外内訳（コード・件数・金額）)
+        """
+        excluded, codes, uniques = self._match(df)
+        kept = df[~excluded]
+
+        excluded_codes = codes[excluded]
+        counts = np.bincount(excluded_codes, minlength=len(uniques))
+        breakdown = pd.DataFrame({self.column: uniques, '件数': counts})
+        if self.amount_column is not None:
+            amounts = df[self.amount_column].to_numpy()[excluded]
+            breakdown['金額'] = np.bincount(excluded_codes, weights=amounts, minlength=len(uniques))
+            if pd.api.types.is_integer_dtype(df[self.amount_column]):
+                breakdown['金額'] = breakdown['金額'].astype(np.int64)
+
+        breakdown = breakdown[counts > 0].sort_values(self.column).reset_index(drop=True)
+        return kept, breakdown
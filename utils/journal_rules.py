@@ -0,0 +1,144 @@
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, FrozenSet, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from utils.config_loader import DEFAULT_CONFIG_PATH, get_config_loader
+from utils.exclusion_filter import ExclusionFilter
+
+
+# 対象外の区分番号
+OUT_OF_RANGE = -1
+
+
+def compile_account_ranges(ranges: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    科目コードの区分定義を、searchsorted用の境界と区分番号に変換
+    Args:
+        ranges: 区分定義のリスト（lower / upper / closed）
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (境界値, 境界で区切られた各区間の区分番号)
+    Raises:
+        ValueError: 区分の範囲が重複・逆転している場合
+    """
+    intervals = []
+    for number, rng in enumerate(ranges):
+        lower = float(rng['lower'])
+        upper = float(rng['upper'])
+        if rng.get('closed', 'left') == 'both':
+            # 上限を含む区間は、上限の直後の値を境界にする
+            upper = np.nextafter(upper, np.inf)
+        if upper <= lower:
+            raise ValueError(f"科目区分の範囲が不正です: {rng.get('name', number)}")
+        intervals.append((lower, upper, number))
+
+    bounds: List[float] = []
+    labels = [OUT_OF_RANGE]
+    for lower, upper, number in sorted(intervals):
+        if bounds and lower < bounds[-1]:
+            raise ValueError(f"科目区分の範囲が重複しています: {ranges[number].get('name', number)}")
+        if bounds and lower == bounds[-1]:
+            # 直前の区分と隣接する場合は空き区間を置き換える
+            labels[-1] = number
+        else:
+            bounds.append(lower)
+            labels.append(number)
+        bounds.append(upper)
+        labels.append(OUT_OF_RANGE)
+    return np.array(bounds, dtype=float), np.array(labels, dtype=np.int64)
+
+
+@dataclass(frozen=True)
+class JournalRules:
+    """仕訳データ変換ルール（設定ファイルの journal セクションをコンパイルしたもの）"""
+
+    range_names: Tuple[str, ...]
+    bounds: np.ndarray  # 区分の境界値（昇順）
+    labels: np.ndarray  # 境界で区切られた各区間の区分番号（対象外は-1）
+    dr_signs: np.ndarray  # 区分番号ごとの借方の符号（末尾は対象外用の0）
+    labor_cost_codes: FrozenSet[str]
+    large_class: Dict[str, str]
+    mid_class: Dict[str, str]
+
+    @classmethod
+    def from_config(cls, config, section: str = 'journal') -> 'JournalRules':
+        """
+        設定ファイルから作成
+        Args:
+            config: ConfigLoader
+            section: 設定セクション名
+        Returns:
+            JournalRules: コンパイル済みのルール
+        """
+        ranges = config.get_settings(section, 'account_ranges') or []
+        classes = config.get_settings(section, 'classes') or {}
+        bounds, labels = compile_account_ranges(ranges)
+        return cls(
+            range_names=tuple(rng.get('name', str(i)) for i, rng in enumerate(ranges)),
+            bounds=bounds,
+            labels=labels,
+            dr_signs=np.array([int(rng['dr_sign']) for rng in ranges] + [0], dtype=np.int64),
+            labor_cost_codes=frozenset(str(code) for code in config.get_settings(section, 'labor_cost_codes') or []),
+            large_class={name: value['large_class'] for name, value in classes.items()},
+            mid_class={name: value['mid_class'] for name, value in classes.items()},
+        )
+
+    @property
+    def class_columns(self) -> List[str]:
+        """配賦データの区分列（定義順）"""
+        return list(self.large_class)
+
+    def classify(self, ac_cd: pd.Series) -> np.ndarray:
+        """
+        科目コードを区分番号に変換（範囲外・欠損値は-1）
+        Args:
+            ac_cd: 科目コードの列（数値）
+        Returns:
+            np.ndarray: 区分番号
+        """
+        values = ac_cd.to_numpy(dtype=float, na_value=np.nan)
+        return self.labels[np.searchsorted(self.bounds, values, side='right')]
+
+    def signs(self, account_class: np.ndarray, side: str) -> np.ndarray:
+        """
+        区分番号から金額の符号を取得（対象外は0）
+        Args:
+            account_class: 区分番号
+            side: 'dr'（借方）または 'cr'（貸方）
+        Returns:
+            np.ndarray: 符号
+        """
+        signs = self.dr_signs[account_class]
+        return signs if side == 'dr' else -signs
+
+    @property
+    def labor_cost_filter(self) -> ExclusionFilter:
+        """人件費の科目コード（文字列のac_cd）を除外するフィルター"""
+        return ExclusionFilter('ac_cd', self.labor_cost_codes, amount_column='price')
+
+
+_RULES: Dict[Tuple[str, Any], JournalRules] = {}
+_RULES_LOCK = threading.Lock()
+
+
+def get_journal_rules(config_path: str = DEFAULT_CONFIG_PATH) -> JournalRules:
+    """
+    仕訳データ変換ルールを取得（設定ファイルが更新された場合のみ再コンパイル）
+    Args:
+        config_path: 設定ファイルのパス
+    Returns:
+        JournalRules: コンパイル済みのルール
+    """
+    config = get_config_loader(config_path)
+    key = (str(config.config_path), config.version)
+    with _RULES_LOCK:
+        rules = _RULES.get(key)
+        if rules is None:
+            rules = JournalRules.from_config(config)
+            # 古い版のルールは破棄
+            for old_key in [k for k in _RULES if k[0] == key[0]]:
+                del _RULES[old_key]
+            _RULES[key] = rules
+        return rules
@@ -0,0 +1,103 @@
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List
+
+import pandas as pd
+import psutil
+
+
+MB = 1024 ** 2
+
+# RSSの標本化の間隔（秒）
+DEFAULT_SAMPLE_INTERVAL = 0.001
+
+REPORT_COLUMNS = ['段階', '時間(ms)', '割当ピーク(MB)', 'RSS(MB)', '最大RSS(MB)', 'RSS増分(MB)']
+
+
+def current_rss() -> float:
+    """
+    現在のRSS（MB）
+    """
+    return psutil.Process().memory_info().rss / MB
+
+
+class RssSampler:
+    """別スレッドでRSSを一定間隔で標本化し、計測中の最大値を記録する"""
+
+    def __init__(self, interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.process = psutil.Process()
+        self.start_rss = 0
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _sample(self) -> None:
+        self.peak_rss = max(self.peak_rss, self.process.memory_info().rss)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def __enter__(self) -> 'RssSampler':
+        self.start_rss = self.peak_rss = self.process.memory_info().rss
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+class StageProfiler:
+    """処理段階ごとの経過時間・メモリ割当のピーク・RSSのピークを記録する"""
+
+    def __init__(self, sample_interval: float = DEFAULT_SAMPLE_INTERVAL):
+        self.sample_interval = sample_interval
+        self.records: List[Dict[str, Any]] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """
+        処理段階の計測
+        （割当ピークはtracemallocで計測した段階内の最大増分で、numpyの配列も含む。
+          最大RSSは段階内でsample_intervalごとに標本化した最大値で、間隔より短い増減は含まれない場合がある）
+        Args:
+            name: 段階名
+        """
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        baseline = tracemalloc.get_traced_memory()[0]
+        sampler = RssSampler(self.sample_interval)
+        start = time.perf_counter()
+        try:
+            with sampler:
+                yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            if started:
+                tracemalloc.stop()
+            self.records.append({
+                '段階': name,
+                '時間(ms)': elapsed * 1000,
+                '割当ピーク(MB)': (peak - baseline) / MB,
+                'RSS(MB)': current_rss(),
+                '最大RSS(MB)': sampler.peak_rss / MB,
+                'RSS増分(MB)': (sampler.peak_rss - sampler.start_rss) / MB,
+            })
+
+    def report(self) -> pd.DataFrame:
+        """
+        計測結果の一覧
+        Returns:
+            pd.DataFrame: 段階ごとの計測結果
+        """
+        return pd.DataFrame(self.records, columns=REPORT_COLUMNS)
@@ -0,0 +1,73 @@
+from typing import Iterable, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 数値以外の文字（カンマ、通貨記号など）を除去する正規表現
+NON_NUMERIC_PATTERN = r'[^\d.-]'
+
+REPORT_COLUMNS = ['カラム', '変換前の型', '補正件数', '無効件数', '欠損件数']
+
+
+def coerce_numeric_columns(df: pd.DataFrame, columns: Iterable[str]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    指定された列を一括で数値に変換（変換できない値・欠損値は0）
+    数値型の列は文字列変換を行わず、文字列の列は2次元のブロックとしてまとめて変換する。
+    正規表現による補正は、そのままでは数値に変換できないセルにのみ適用する。
+    Args:
+        df: 入力データフレーム（直接更新する）
+        columns: 数値に変換する列（存在しない列は無視）
+    Returns:
+        Tuple[pd.DataFrame, pd.DataFrame]: (変換後のデータフレーム, 列ごとの変換結果)
+    """
+    targets = [col for col in dict.fromkeys(columns) if col in df.columns]
+    numeric_cols = [col for col in targets
+                    if pd.api.types.is_numeric_dtype(df[col]) and not pd.api.types.is_bool_dtype(df[col])]
+    text_cols = [col for col in targets if col not in numeric_cols]
+
+    report = []
+
+    # 数値型の列は欠損値の補完のみ
+    for col in numeric_cols:
+        missing = int(df[col].isna().sum())
+        if missing:
+            df[col] = df[col].fillna(0)
+        report.append((col, str(df[col].dtype), 0, 0, missing))
+
+    if text_cols:
+        n_rows, n_cols = len(df), len(text_cols)
+        # 列ごとに連続するよう列優先で1次元化
+        cells = pd.Series(df[text_cols].to_numpy(dtype=object).ravel(order='F'))
+        as_text = cells.astype(str)
+        blank = cells.isna().to_numpy() | (as_text.str.strip() == '').to_numpy()
+        # 小数点を含む値がある列はfloat64とする（pd.to_numericと同じ）
+        dotted = as_text.str.contains('.', regex=False).to_numpy()
+
+        # 補正結果を書き込むため、書き込み可能な配列として取得（Copy-on-Write有効時は読み取り専用のビューになる）
+        parsed = pd.to_numeric(cells, errors='coerce').to_numpy(dtype=float, copy=True)
+        failed = ~blank & ~np.isfinite(parsed)
+        if failed.any():
+            # 数値に変換できなかったセルのみ不要な文字を除去して再変換
+            cleaned = cells[failed].astype(str).str.replace(NON_NUMERIC_PATTERN, '', regex=True)
+            parsed[failed] = pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype=float)
+        invalid = ~blank & np.isnan(parsed)
+
+        values = parsed.reshape((n_rows, n_cols), order='F')
+        failed = failed.reshape((n_rows, n_cols), order='F')
+        invalid = invalid.reshape((n_rows, n_cols), order='F')
+        blank = blank.reshape((n_rows, n_cols), order='F')
+        dotted = dotted.reshape((n_rows, n_cols), order='F')
+
+        for j, col in enumerate(text_cols):
+            column = values[:, j]
+            has_nan = np.isnan(column).any()
+            column = np.where(np.isnan(column), 0.0, column)
+            # 欠損がなく全て整数の列はint64とする（pd.to_numericと同じ）
+            if not has_nan and not dotted[:, j].any() and np.array_equal(column, np.trunc(column)):
+                column = column.astype(np.int64)
+            report.append((col, str(df[col].dtype), int(failed[:, j].sum() - invalid[:, j].sum()),
+                           int(invalid[:, j].sum()), int(blank[:, j].sum())))
+            df[col] = column
+
+    return df, pd.DataFrame(report, columns=REPORT_COLUMNS)
@@ -0,0 +1,302 @@
+import json
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+class Predicate(NamedTuple):
+    """単一カラムに対する条件"""
+    column: str
+    op: str  # '==', '>', '<'
+    operand: Any
+
+
+class Rule(NamedTuple):
+    """条件付き変換ルール（全条件のAND）"""
+    predicates: Tuple[Predicate, ...]
+    target: str
+    value: Any = None
+    source: Optional[str] = None
+
+
+def parse_condition(column: str, cond_val: Any) -> Predicate:
+    """
+    YAMLの条件値を述語に変換
+    Args:
+        column: 対象カラム名
+        cond_val: 条件値（"> 1" / "< 1" 形式の文字列は数値比較）
+    Returns:
+        Predicate: 述語
+    """
+    if isinstance(cond_val, str) and cond_val[:1] in ('>', '<'):
+        try:
+            num = float(cond_val[1:].strip())
+        except ValueError:
+            # 数値に変換できない比較は常に不一致
+            num = None
+        return Predicate(column, cond_val[0], num)
+    return Predicate(column, '==', cond_val)
+
+
+def normalize_rules(rules: Union[Dict[str, List[dict]], List[dict]]) -> List[Rule]:
+    """
+    YAML形式のルール定義をRuleのリストに変換（定義順を保持）
+    Args:
+        rules: グループ名→ルールリストの辞書、またはルールのリスト
+    Returns:
+        List[Rule]: 正規化されたルール
+    """
+    if isinstance(rules, dict):
+        rule_list = [rule for group in rules.values() for rule in (group or [])]
+    else:
+        rule_list = list(rules or [])
+
+    normalized = []
+    for rule in rule_list:
+        conditions = rule.get('conditions', {})
+        target = rule.get('target')
+        if not target or not conditions:
+            continue
+        predicates = tuple(parse_condition(col, val) for col, val in conditions.items())
+        normalized.append(Rule(predicates, target, rule.get('value'), rule.get('source')))
+    return normalized
+
+
+class _ColumnState:
+    """ルール適用中のカラムの状態（元の値と未反映の書き込み）"""
+
+    def __init__(self, series: Optional[pd.Series], length: int):
+        if series is None:
+            # 存在しないカラムへの書き込みはNaNで初期化される（df.locと同じ）
+            self.series = None
+            self.base = np.full(length, np.nan)
+        else:
+            self.series = series
+            self.base = series.to_numpy()
+        self.writes: List[Tuple[np.ndarray, Any]] = []
+        self._codes = None
+        self._uniques = None
+        self._eq_cache: Dict[Any, np.ndarray] = {}
+        self._eq_state: Dict[Any, Tuple[int, np.ndarray]] = {}
+        self._current = (0, self.base)
+        self._float = None
+
+    @property
+    def version(self) -> int:
+        """書き込み回数（値が変わったかどうかの判定用）"""
+        return len(self.writes)
+
+    def write(self, mask: np.ndarray, choice: Any) -> None:
+        self.writes.append((mask, choice))
+
+    def _base_eq(self, operand: Any) -> np.ndarray:
+        """元の値に対する等値判定（factorize済みのコードで一括判定）"""
+        key = (type(operand), operand)
+        if key not in self._eq_cache:
+            if self._codes is None:
+                source = self.series if self.series is not None else pd.Series(self.base)
+                self._codes, self._uniques = pd.factorize(source)
+            matched = np.flatnonzero((pd.Series(self._uniques) == operand).to_numpy())
+            if len(matched) == 0:
+                result = np.zeros(len(self._codes), dtype=bool)
+            elif len(matched) == 1:
+                result = self._codes == matched[0]
+            else:
+                result = np.isin(self._codes, matched)
+            self._eq_cache[key] = result
+        return self._eq_cache[key]
+
+    def eq(self, operand: Any) -> np.ndarray:
+        key = (type(operand), operand)
+        version, result = self._eq_state.get(key) or (0, None)
+        if result is None:
+            result = self._base_eq(operand)
+        # 前回の判定以降に書き込まれた行のみ、書き込んだ値で判定し直す
+        for mask, choice in self.writes[version:]:
+            if isinstance(choice, np.ndarray):
+                hit = (pd.Series(choice, copy=False) == operand).to_numpy()
+                result = np.where(mask, hit, result)
+            elif bool(choice == operand):
+                result = result | mask
+            else:
+                result = result & ~mask
+        self._eq_state[key] = (len(self.writes), result)
+        return result
+
+    def current(self) -> np.ndarray:
+        """書き込みを反映した現在の値（後勝ち）"""
+        version, values = self._current
+        if version != len(self.writes):
+            # 前回の結果に新しい書き込みのみを反映
+            values = _select(values, self.writes[version:], new_column=self.series is None and version == 0)
+            self._current = (len(self.writes), values)
+        return values
+
+    def compare(self, op: str, num: Optional[float]) -> np.ndarray:
+        n = len(self.base)
+        if num is None:
+            return np.zeros(n, dtype=bool)
+        if self._float is None or self._float[0] != len(self.writes):
+            try:
+                as_float = pd.Series(self.current(), copy=False).astype(float).to_numpy()
+            except (TypeError, ValueError):
+                # 数値変換できないカラムとの比較は常に不一致
+                as_float = None
+            self._float = (len(self.writes), as_float)
+        as_float = self._float[1]
+        if as_float is None:
+            return np.zeros(n, dtype=bool)
+        return as_float > num if op == '>' else as_float < num
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, (int, np.integer)) and not isinstance(value, (bool, np.bool_))
+
+
+def _setitem_dtype(values: np.ndarray, mask: np.ndarray, choice: Any, new_column: bool = False) -> np.dtype:
+    """
+    df.loc[mask, カラム] = 値 を行った後のカラムの型を取得
+    （整数列に整数値の浮動小数点を書き込む場合は整数のまま等、pandasの型の決定に従う）
+    Args:
+        values: 書き込み前の値
+        mask: 書き込む行
+        choice: 書き込む値（スカラーまたは行ごとの値の配列）
+        new_column: 存在しないカラムへの書き込みの場合はTrue
+    Returns:
+        np.dtype: 書き込み後の型
+    """
+    if not new_column:
+        dtype = values.dtype
+        if dtype == object:
+            return dtype
+        if isinstance(choice, np.ndarray):
+            if choice.dtype == dtype:
+                return dtype
+        elif dtype.kind == 'i' and _is_int(choice) and np.iinfo(dtype).min <= choice <= np.iinfo(dtype).max:
+            return dtype
+        elif dtype.kind == 'f' and (_is_int(choice) or isinstance(choice, (float, np.floating))):
+            return dtype
+        elif dtype.kind == 'b' and isinstance(choice, (bool, np.bool_)):
+            return dtype
+
+    # 書き込む行（と書き込まない行1行）だけで同じ代入を行い、結果の型を使う
+    rows = np.flatnonzero(mask)
+    probe_rows = np.concatenate([rows, np.flatnonzero(~mask)[:1]])
+    probe = pd.DataFrame(index=pd.RangeIndex(len(probe_rows)))
+    if not new_column:
+        probe['value'] = values[probe_rows]
+    probe_mask = np.arange(len(probe_rows)) < len(rows)
+    if isinstance(choice, np.ndarray):
+        choice = pd.Series(choice[rows], index=probe.index[:len(rows)])
+    probe.loc[probe_mask, 'value'] = choice
+    return probe['value'].dtype
+
+
+def _select(base: np.ndarray, writes: List[Tuple[np.ndarray, Any]], new_column: bool = False) -> np.ndarray:
+    """
+    書き込みを順に反映した新しい配列を作成（後のルールを優先、元の配列は変更しない）
+    Args:
+        base: 元の値
+        writes: (マスク, 値または値配列) のリスト（適用順）
+        new_column: baseが存在しないカラムの初期値（NaN）の場合はTrue
+    Returns:
+        np.ndarray: 合成後の値（型は書き込みごとにdf.locと同じ規則で決定）
+    """
+    if not writes:
+        return base
+    values = None
+    for mask, choice in writes:
+        dtype = _setitem_dtype(base if values is None else values, mask, choice,
+                               new_column=new_column and values is None)
+        if values is None:
+            if dtype.kind in 'fcO':
+                values = base.astype(dtype, copy=True)
+            else:
+                # 全行に書き込む場合のみ欠損値を含まない型になる
+                values = np.zeros(len(base), dtype=dtype) if new_column else base.astype(dtype, copy=True)
+        elif dtype != values.dtype:
+            values = values.astype(dtype)
+        np.copyto(values, choice, where=mask, casting='unsafe')
+    return values
+
+
+class RulePlan:
+    """コンパイル済みの条件付き変換ルール"""
+
+    def __init__(self, rules: List[Rule]):
+        self.rules = rules
+
+    def apply(self, df: pd.DataFrame) -> None:
+        """
+        データフレームにルールを適用（定義順に順次適用した場合と同じ結果）
+        Args:
+            df: 変換対象のデータフレーム（RangeIndexを想定、直接更新する）
+        Raises:
+            KeyError: 条件のカラムが存在しない場合（それまでのルールは適用済み）
+        """
+        length = len(df)
+        states: Dict[str, _ColumnState] = {}
+        columns = set(df.columns)
+        # 条件の組ごとの判定結果（参照カラムに書き込みがなければ再利用）
+        masks: Dict[Tuple[Predicate, ...], Tuple[Tuple[int, ...], np.ndarray]] = {}
+
+        def state(col: str) -> _ColumnState:
+            if col not in states:
+                states[col] = _ColumnState(df[col] if col in df.columns else None, length)
+            return states[col]
+
+        def evaluate(predicates: Tuple[Predicate, ...]) -> np.ndarray:
+            for predicate in predicates:
+                if predicate.column not in columns:
+                    raise KeyError(predicate.column)
+            versions = tuple(state(p.column).version for p in predicates)
+            cached = masks.get(predicates)
+            if cached is not None and cached[0] == versions:
+                return cached[1]
+            mask = np.ones(length, dtype=bool)
+            for predicate in predicates:
+                col_state = state(predicate.column)
+                if predicate.op == '==':
+                    mask &= col_state.eq(predicate.operand)
+                else:
+                    mask &= col_state.compare(predicate.op, predicate.operand)
+            masks[predicates] = (versions, mask)
+            return mask
+
+        try:
+            for rule in self.rules:
+                mask = evaluate(rule.predicates)
+
+                if rule.value is not None:
+                    choice = rule.value
+                elif rule.source is not None and rule.source in columns:
+                    choice = state(rule.source).current()
+                else:
+                    continue
+
+                # 一致行がなくても型の変更・カラム作成はdf.locと同様に行われるため記録する
+                state(rule.target).write(mask, choice)
+                columns.add(rule.target)
+        finally:
+            # 1カラムにつき1回だけ書き戻す
+            for col, col_state in states.items():
+                if col_state.writes:
+                    df[col] = col_state.current()
+
+
+_PLAN_CACHE: Dict[str, RulePlan] = {}
+
+
+def compile_rules(rules: Union[Dict[str, List[dict]], List[dict]]) -> RulePlan:
+    """
+    ルール定義をコンパイル（同一定義は再利用）
+    Args:
+        rules: YAML形式のルール定義
+    Returns:
+        RulePlan: コンパイル済みルール
+    """
+    key = json.dumps(rules, ensure_ascii=False, sort_keys=False, default=str)
+    if key not in _PLAN_CACHE:
+        _PLAN_CACHE[key] = RulePlan(normalize_rules(rules))
+    return _PLAN_CACHE[key]